@@ -0,0 +1,214 @@
+from functools import wraps
+from itertools import chain
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .feed import follow_feed
+from .models import Comment, Group, Post, User
+from .paginator import CursorPaginator
+
+# Поле ответа -> путь для values(). pk и дата для курсора читаются
+# всегда, даже если их нет в ?fields=.
+POST_FIELDS = {
+    "id": "pk",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comment_count": "comment_count",
+}
+
+COMMENT_FIELDS = {
+    "id": "pk",
+    "text": "text",
+    "created": "created",
+    "author": "author__username",
+}
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {"image": image_url}
+
+# Сколько строк читается из курсора базы за раз и сколько объектов
+# уходит клиенту одним куском ответа.
+CHUNK_SIZE = 500
+FLUSH_EVERY = 100
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+class ApiError(Exception):
+    pass
+
+
+def api_view(view):
+    """
+    Только GET и HEAD, ошибки и 404 отдаются в JSON.
+    """
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        except Http404:
+            return JsonResponse({"error": "Не найдено."}, status=404)
+    return wrapper
+
+
+def parse_fields(request, available):
+    """
+    Разреженный набор полей из ?fields=id,text; по умолчанию все поля.
+    """
+    names = request.GET.get("fields", "").split(",")
+    names = [name.strip() for name in names if name.strip()]
+    if not names:
+        return list(available)
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise ApiError(f"Неизвестные поля: {', '.join(unknown)}.")
+    return names
+
+
+def parse_limit(request, default):
+    try:
+        limit = int(request.GET.get("limit", default))
+    except ValueError:
+        raise ApiError("limit должен быть числом.")
+    if not 1 <= limit <= settings.API_MAX_LIMIT:
+        raise ApiError(f"limit должен быть от 1 до {settings.API_MAX_LIMIT}.")
+    return limit
+
+
+def project(row, fields, available):
+    result = {}
+    for name in fields:
+        value = row[available[name]]
+        convert = CONVERTERS.get(name)
+        result[name] = convert(value) if convert else value
+    return result
+
+
+class Feed:
+    """
+    Страница ленты по курсору в виде {"results": [...], "next": курсор}.
+    Строки читаются через values() только с нужными полями и
+    сериализуются по мере чтения, так что ответ с limit в тысячи
+    записей не собирается в памяти целиком.
+    """
+
+    def __init__(self, queryset, available, fields, limit, cursor=None,
+                 date_field="pub_date", descending=True):
+        self.paginator = CursorPaginator(queryset, limit,
+                                         date_field=date_field,
+                                         descending=descending)
+        self.available = available
+        self.fields = fields
+        self.limit = limit
+        lookups = {"pk", date_field}
+        lookups.update(available[name] for name in fields)
+        rows = self.paginator.after(cursor).values(*lookups)
+        # База выбирается сейчас: тело ответа читается уже после
+        # ReplicaMiddleware, который к тому времени выключит реплику.
+        self.rows = rows.using(rows.db)[:limit + 1]
+
+    def __iter__(self):
+        yield '{"results": ['
+        parts = []
+        last = next_cursor = None
+        for number, row in enumerate(self.rows.iterator(CHUNK_SIZE)):
+            if number == self.limit:
+                next_cursor = self.paginator.cursor_for(last)
+                break
+            parts.append(("," if number else "") + encoder.encode(
+                project(row, self.fields, self.available)
+            ))
+            if len(parts) == FLUSH_EVERY:
+                yield "".join(parts)
+                parts = []
+            last = row
+        parts.append(f'], "next": {encoder.encode(next_cursor)}}}')
+        yield "".join(parts)
+
+
+def stream(chunks):
+    return StreamingHttpResponse(chunks, content_type="application/json")
+
+
+def post_feed(request, queryset):
+    return stream(Feed(
+        queryset, POST_FIELDS, parse_fields(request, POST_FIELDS),
+        parse_limit(request, settings.PER_PAGE), request.GET.get("cursor"),
+    ))
+
+
+def comment_feed(post_id, fields, limit, cursor=None):
+    return Feed(Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+                fields, limit, cursor, date_field="created",
+                descending=False)
+
+
+@api_view
+def posts(request):
+    return post_feed(request, Post.objects.all())
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only("pk"), slug=slug)
+    return post_feed(request, group.posts.all())
+
+
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only("pk"), username=username)
+    return post_feed(request, author.posts.all())
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Нужно войти на сайт."}, status=401)
+    return post_feed(request, follow_feed(request.user))
+
+
+@api_view
+def post_detail(request, post_id):
+    """
+    Пост и первая страница его комментариев; следующие страницы
+    отдает post_comments по курсору из comments.next.
+    """
+    fields = parse_fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *{"pk", *(POST_FIELDS[name] for name in fields)}
+    ).first()
+    if row is None:
+        raise Http404
+    post = encoder.encode(project(row, fields, POST_FIELDS))
+    return stream(chain(
+        [f'{{"post": {post}, "comments": '],
+        comment_feed(post_id, list(COMMENT_FIELDS),
+                     settings.COMMENTS_PER_PAGE),
+        ["}"],
+    ))
+
+
+@api_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return stream(comment_feed(
+        post_id, parse_fields(request, COMMENT_FIELDS),
+        parse_limit(request, settings.COMMENTS_PER_PAGE),
+        request.GET.get("cursor"),
+    ))
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import api
+
+app_name = "api_v1"
+
+urlpatterns = [
+    path("posts/", api.posts, name="posts"),
+    path("posts/<int:post_id>/", api.post_detail, name="post"),
+    path("posts/<int:post_id>/comments/", api.post_comments,
+         name="post_comments"),
+    path("groups/<slug:slug>/posts/", api.group_posts, name="group_posts"),
+    path("users/<str:username>/posts/", api.profile_posts,
+         name="profile_posts"),
+    path("follow/", api.follow_posts, name="follow"),
+]
@@ -0,0 +1,120 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+
+from yatube.routers import reading_from_replica
+
+
+def _version_key(name):
+    return f"feed_version:{name}"
+
+
+def feed_version(name):
+    """
+    Текущая версия ленты. Входит в ключ закэшированного фрагмента,
+    поэтому фрагмент живет бессрочно и сбрасывается при bump_feeds.
+    """
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Версия из времени больше любой ранее выданной, даже если
+        # счетчик вытеснили из кэша.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_feeds(*names):
+    for name in names:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            pass
+    now = time.time()
+    cache.set_many({_modified_key(name): now for name in names}, None)
+
+
+def reset_feeds():
+    """
+    Сбрасывает кэш после массовых изменений в обход сигналов (загрузка
+    выгрузки, генерация данных, пересчет счетчиков): закэшированные
+    страницы, фрагменты, числа постов и версии лент. Версии лент
+    выдаются заново из времени и больше любых прежних, поэтому старые
+    ETag больше не совпадают. Записи sorl перечитываются из базы.
+    """
+    cache.clear()
+
+
+def _modified_key(name):
+    return f"feed_modified:{name}"
+
+
+def feeds_modified(names):
+    """
+    Время последнего bump_feeds для лент names или None, если оно
+    неизвестно хотя бы для одной (ленту еще не меняли или ключ вытеснен).
+    """
+    keys = [_modified_key(name) for name in names]
+    times = cache.get_many(keys)
+    if len(times) < len(keys):
+        return None
+    return max(times.values())
+
+
+def feed_count(name, queryset):
+    """
+    Число постов в ленте из кэша. Сигналы поправляют его при создании
+    и удалении постов (adjust_counts), а раз в FEED_COUNT_TIMEOUT секунд
+    оно считается заново, так что расхождения не копятся. Число,
+    посчитанное на реплике, в кэш не попадает.
+    """
+    key = f"feed_count:{name}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        if not reading_from_replica():
+            cache.add(key, count, settings.FEED_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_counts(names, delta):
+    """
+    Поправляет закэшированные числа постов лент после коммита, чтобы
+    откаченная транзакция не сдвигала их.
+    """
+    def adjust():
+        for name in names:
+            try:
+                cache.incr(f"feed_count:{name}", delta)
+            except ValueError:
+                pass
+
+    transaction.on_commit(adjust)
+
+
+def post_feeds(author_id, group_id):
+    names = ["index", f"profile:{author_id}"]
+    if group_id:
+        names.append(f"group:{group_id}")
+    return names
+
+
+def forget_post_item(post):
+    """
+    Удаляет закэшированные фрагменты post_item.html отредактированного
+    поста (для автора и для остальных читателей). Имя автора и группа
+    входят в ключ фрагмента, так что после их переименования фрагмент
+    просто строится заново.
+    """
+    # Без группы шаблон подставляет в ключ пустые строки.
+    group = post.group
+    slug, title = (group.slug, group.title) if group else ("", "")
+    cache.delete_many([
+        make_template_fragment_key("post_item", [
+            post.pk, post.comment_count, post.author.username, slug, title,
+            is_author,
+        ]) for is_author in (True, False)
+    ])
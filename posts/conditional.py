@@ -0,0 +1,61 @@
+import hashlib
+import time
+
+from datetime import datetime, timezone
+
+from django.views.decorators.http import condition
+
+from yatube.routers import reading_from_replica
+
+from .cache import feed_version, feeds_modified
+
+
+def validators(request, names):
+    """
+    ETag и Last-Modified страницы по версиям лент names. В ETag входят
+    еще пользователь, CSRF-токен формы и полный адрес, поэтому разные
+    пользователи и страницы ленты не получают чужой 304. Last-Modified
+    от пользователя не зависит и отдается только анонимным: иначе после
+    входа или выхода If-Modified-Since вернул бы 304 на страницу,
+    показанную другому пользователю. Страница, прочитанная с реплики,
+    может отставать от версий лент, поэтому валидаторов у нее нет.
+    """
+    if names is None or reading_from_replica():
+        return None, None
+    parts = [str(feed_version(name)) for name in names]
+    parts += [str(request.user.pk), request.META.get("CSRF_COOKIE", ""),
+              request.get_full_path()]
+    etag = hashlib.md5("|".join(parts).encode()).hexdigest()
+    if request.user.is_authenticated:
+        return etag, None
+    modified = feeds_modified(names)
+    # В HTTP-датах только целые секунды: изменение в ту же секунду
+    # If-Modified-Since не заметил бы, поэтому свежую ленту проверяет
+    # только ETag.
+    if modified is None or time.time() - modified < 1:
+        return etag, None
+    return etag, datetime.fromtimestamp(int(modified), timezone.utc)
+
+
+def conditional_feed(feed_names):
+    """
+    Условный GET для страницы: feed_names(request, **kwargs) возвращает
+    имена версий из posts.cache, от которых зависит страница, или None,
+    если объекта нет. Если страница не изменилась, ответ 304 отдается
+    без шаблона и без запросов к постам. Имена версий остаются
+    в request._feed_names для кэша самого представления.
+    """
+    def get_validators(request, kwargs):
+        if not hasattr(request, "_feed_validators"):
+            request._feed_names = feed_names(request, **kwargs)
+            request._feed_validators = validators(request,
+                                                  request._feed_names)
+        return request._feed_validators
+
+    def etag(request, *args, **kwargs):
+        return get_validators(request, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return get_validators(request, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,89 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    "posts_count": (Post, "author"),
+    "followers_count": (Follow, "author"),
+    "following_count": (Follow, "user"),
+}
+
+
+def count_by(model, field):
+    return dict(
+        model.objects.order_by().values(field)
+        .annotate(count=Count("pk")).values_list(field, "count")
+    )
+
+
+def bump_user(user_id, **deltas):
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+
+
+def user_stats(user):
+    """
+    Счетчики пользователя для карточки автора. Если строки нет
+    (пользователь создан в обход сигналов, например bulk_create),
+    создает ее, посчитав значения по таблицам.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    values = {name: model.objects.filter(**{field: user}).count()
+              for name, (model, field) in USER_COUNTERS.items()}
+    stats, _ = UserStats.objects.get_or_create(user=user, defaults=values)
+    user.stats = stats
+    return stats
+
+
+def bump_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F("comment_count") + delta
+    )
+
+
+def recount_all():
+    """
+    Пересчитывает все счетчики и исправляет расхождения.
+    Возвращает число исправленных пользователей и постов.
+    """
+    actual = {name: count_by(model, field)
+              for name, (model, field) in USER_COUNTERS.items()}
+    stored = UserStats.objects.in_bulk()
+    missing, changed = [], []
+    for user_id in User.objects.values_list("pk", flat=True).iterator():
+        values = {name: counts.get(user_id, 0)
+                  for name, counts in actual.items()}
+        stats = stored.get(user_id)
+        if stats is None:
+            missing.append(UserStats(user_id=user_id, **values))
+        elif any(getattr(stats, name) != value
+                 for name, value in values.items()):
+            for name, value in values.items():
+                setattr(stats, name, value)
+            changed.append(stats)
+    # Размер пачки для вставки выбирает бэкенд: у SQLite он ограничен.
+    UserStats.objects.bulk_create(missing)
+    UserStats.objects.bulk_update(changed, list(USER_COUNTERS),
+                                  batch_size=1000)
+
+    comments = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    actual_comments = Coalesce(Subquery(comments), 0)
+    drifted = (
+        Post.objects.annotate(actual=actual_comments)
+        .exclude(comment_count=F("actual"))
+    )
+    posts_fixed = drifted.count()
+    if posts_fixed:
+        Post.objects.update(comment_count=actual_comments)
+    return len(missing) + len(changed), posts_fixed
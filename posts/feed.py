@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+
+def fan_out(post):
+    """
+    Раскладывает новый пост в ленты подписчиков автора. Посты авторов
+    с числом подписчиков больше FEED_FANOUT_LIMIT не раскладываются,
+    а подтягиваются при чтении ленты (см. follow_feed). Такой автор
+    помечается в UserStats.feed_pulled и читается напрямую, даже когда
+    подписчиков становится меньше, пока ленты не пересоберет rebuild.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list("user_id", flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        UserStats.objects.filter(user_id=post.author_id,
+                                 feed_pulled=False).update(feed_pulled=True)
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post=post, author_id=post.author_id,
+                   pub_date=post.pub_date) for user_id in followers],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """
+    Добавляет в ленту пользователя последние FEED_BACKFILL_LIMIT постов
+    автора после подписки. Более старые посты в ленту не попадают.
+    """
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by("-pub_date", "-pk")
+        .values_list("pk", "pub_date")[:settings.FEED_BACKFILL_LIMIT]
+    )
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                   pub_date=pub_date) for pk, pub_date in posts],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """
+    Убирает из ленты пользователя посты автора после отписки.
+    """
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pulled_authors(user):
+    """
+    Авторы из подписок пользователя, чьи посты не раскладываются
+    по лентам из-за большого числа подписчиков или когда-то не были
+    разложены. Число подписчиков берется из UserStats: подписки
+    пользователя читаются по индексу, а подписчики авторов
+    не пересчитываются.
+    """
+    return list(
+        Follow.objects.filter(user=user).filter(
+            Q(author__stats__followers_count__gt=settings.FEED_FANOUT_LIMIT)
+            | Q(author__stats__feed_pulled=True)
+        ).values_list("author_id", flat=True)
+    )
+
+
+def follow_feed(user):
+    """
+    Лента подписок пользователя: посты из материализованной ленты плюс,
+    для авторов с большим числом подписчиков, их посты напрямую.
+    """
+    authors = pulled_authors(user)
+    if not authors:
+        # Сортировка по дате из самой ленты читает ее по индексу
+        # (user, -pub_date) без сортировки в памяти.
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            "-feed_entries__pub_date"
+        )
+    return Post.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values("post_id"))
+        | Q(author_id__in=authors)
+    )
+
+
+def rebuild():
+    """
+    Заново раскладывает посты по лентам подписчиков. Как и backfill,
+    кладет в ленту только последние FEED_BACKFILL_LIMIT постов каждого
+    автора; авторы больше чем с FEED_FANOUT_LIMIT подписчиками
+    пропускаются, как в fan_out, и помечаются feed_pulled. Нужна после
+    массовой загрузки данных в обход сигналов. Возвращает число записей
+    в лентах.
+    """
+    entries = FeedEntry._meta.db_table
+    posts, follows = Post._meta.db_table, Follow._meta.db_table
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {entries} (user_id, post_id, author_id, pub_date) "
+            f"SELECT f.user_id, p.id, p.author_id, p.pub_date "
+            f"FROM {follows} f JOIN ("
+            f"SELECT id, author_id, pub_date, ROW_NUMBER() OVER ("
+            f"PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS n "
+            f"FROM {posts}) p ON p.author_id = f.author_id "
+            f"WHERE p.n <= %s AND f.author_id NOT IN ("
+            f"SELECT author_id FROM {follows} GROUP BY author_id "
+            f"HAVING COUNT(*) > %s)",
+            [settings.FEED_BACKFILL_LIMIT, settings.FEED_FANOUT_LIMIT],
+        )
+    pulled = (
+        Follow.objects.values("author_id").annotate(followers=Count("pk"))
+        .filter(followers__gt=settings.FEED_FANOUT_LIMIT).values("author_id")
+    )
+    UserStats.objects.filter(feed_pulled=True).exclude(
+        user_id__in=pulled
+    ).update(feed_pulled=False)
+    UserStats.objects.filter(user_id__in=pulled).update(feed_pulled=True)
+    return FeedEntry.objects.count()
@@ -0,0 +1,139 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from yatube.routers import reading_from_replica
+
+from .cache import feed_version
+from .conditional import conditional_feed
+from .models import Group, Post, User
+from .views import group_feeds, index_feeds, profile_feeds
+
+
+class PostsFeed(Feed):
+    """
+    RSS с последними SYNDICATION_ITEMS постами ленты. Посты читаются
+    одним запросом values() только с нужными столбцами. Готовый ответ
+    кэшируется по версиям лент из posts.cache, которые меняются при
+    сохранении и удалении поста, а неизменившаяся лента отдает 304.
+    Подклассы задают feed_names - функцию имен версий для
+    conditional_feed; посты берутся у объекта ленты (группы или автора),
+    а без объекта - все.
+    """
+
+    def __call__(self, request, *args, **kwargs):
+        view = conditional_feed(self.feed_names)(self.cached)
+        return view(request, *args, **kwargs)
+
+    def render(self, request, *args, **kwargs):
+        response = super().__call__(request, *args, **kwargs)
+        # Feed ставит Last-Modified по дате последнего поста с точностью
+        # до секунды, а 304 решается по версиям лент: дату ставит
+        # conditional_feed, если она надежна.
+        del response["Last-Modified"]
+        return response
+
+    def cached(self, request, *args, **kwargs):
+        names = request._feed_names
+        if names is None or reading_from_replica():
+            # Объекта нет, и Feed сам ответит 404, или лента прочитана
+            # с отстающей реплики и не должна попасть в кэш.
+            return self.render(request, *args, **kwargs)
+        versions = "|".join(str(feed_version(name)) for name in names)
+        key = "syndication:" + hashlib.md5(
+            f"{type(self).__name__}|{request.path}|{versions}".encode()
+        ).hexdigest()
+        response = cache.get(key)
+        if response is None:
+            response = self.render(request, *args, **kwargs)
+            cache.set(key, response, settings.SYNDICATION_CACHE_TIMEOUT)
+        return response
+
+    def items(self, obj):
+        posts = Post.objects.all() if obj is None else obj.posts.all()
+        return posts.values(
+            "pk", "text", "pub_date", "author__username"
+        )[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item["text"]).words(8)
+
+    def item_description(self, item):
+        return linebreaksbr(item["text"], autoescape=True)
+
+    def item_link(self, item):
+        return reverse("post", kwargs={"username": item["author__username"],
+                                       "post_id": item["pk"]})
+
+    def item_pubdate(self, item):
+        return item["pub_date"]
+
+    def item_author_name(self, item):
+        return item["author__username"]
+
+
+class IndexFeed(PostsFeed):
+    feed_names = staticmethod(index_feeds)
+    title = "Yatube"
+    description = "Новые записи Yatube"
+
+    def link(self):
+        return reverse("index")
+
+
+class GroupFeed(PostsFeed):
+    feed_names = staticmethod(group_feeds)
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f"Yatube: {obj.title}"
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse("group_posts", kwargs={"slug": obj.slug})
+
+
+class ProfileFeed(PostsFeed):
+    feed_names = staticmethod(profile_feeds)
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f"Yatube: {obj.username}"
+
+    def description(self, obj):
+        return f"Записи {obj.get_full_name() or obj.username}"
+
+    def link(self, obj):
+        return reverse("profile", kwargs={"username": obj.username})
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr("description", obj)
+
+
+class AtomIndexFeed(AtomMixin, IndexFeed):
+    pass
+
+
+class AtomGroupFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AtomProfileFeed(AtomMixin, ProfileFeed):
+    pass
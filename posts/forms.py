@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Comment, Post
+from .uploads import check_upload
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +14,12 @@ class PostForm(forms.ModelForm):
             },
         }
 
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        if image and "image" in self.changed_data:
+            check_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,85 @@
+import logging
+import multiprocessing
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+
+# Адрес не из INTERNAL_IPS: иначе в замеры попадет debug toolbar.
+CLIENT_ADDR = "192.0.2.1"
+
+
+def run_worker(args):
+    """
+    Делает запросы к страницам в отдельном процессе и считает попадания
+    и промахи кэша, как это происходит в отдельном воркере gunicorn.
+    """
+    paths, requests = args
+    cache = caches["default"]
+    get, get_many = cache.get, cache.get_many
+    stats = {"hits": 0, "misses": 0}
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, default, version)
+        stats["hits" if value is not default else "misses"] += 1
+        return value
+
+    def counted_get_many(keys, version=None):
+        values = get_many(keys, version)
+        stats["hits"] += len(values)
+        stats["misses"] += len(keys) - len(values)
+        return values
+
+    cache.get, cache.get_many = counted_get, counted_get_many
+    client = Client(REMOTE_ADDR=CLIENT_ADDR)
+    for i in range(requests):
+        client.get(paths[i % len(paths)])
+    return stats
+
+
+class Command(BaseCommand):
+    help = ("Измеряет долю попаданий в кэш при запросах к лентам "
+            "из нескольких процессов.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=50,
+                            help="Запросов на один процесс.")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="Адрес страницы, можно указать несколько.")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or ["/"]
+        workers = options["workers"]
+        self.stdout.write(
+            f"Кэш: {settings.CACHES['default']['BACKEND']}, "
+            f"процессов: {workers}, запросов на процесс: "
+            f"{options['requests']}"
+        )
+        caches["default"].clear()
+        # Строка лога на каждый запрос только мешает читать отчет.
+        logging.getLogger("yatube.requests").setLevel(logging.WARNING)
+        # Соединения с базой нельзя передавать в дочерние процессы.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with context.Pool(workers) as pool:
+            results = pool.map(run_worker,
+                               [(paths, options["requests"])] * workers)
+
+        for number, stats in enumerate(results, 1):
+            self.stdout.write(self.format_stats(f"Процесс {number}", stats))
+        total = {
+            key: sum(stats[key] for stats in results)
+            for key in ("hits", "misses")
+        }
+        self.stdout.write(self.style.SUCCESS(
+            self.format_stats("Всего", total)
+        ))
+
+    def format_stats(self, title, stats):
+        lookups = stats["hits"] + stats["misses"]
+        rate = stats["hits"] / lookups if lookups else 0
+        return (f"{title}: попаданий {stats['hits']}, "
+                f"промахов {stats['misses']}, доля попаданий {rate:.1%}")
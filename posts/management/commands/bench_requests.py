@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from posts.models import Follow, Group, Post, User
+from posts.seed import seed
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+CLIENT_ADDR = "192.0.2.1"
+
+DEFAULT_MIX = os.path.join(settings.BASE_DIR, "bench", "feeds.jsonl")
+
+
+def percentile(values, percent):
+    """
+    Процентиль по методу ближайшего ранга, values отсортированы.
+    """
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def load_mix(path):
+    """
+    Читает смесь запросов: по строке JSON на запрос с полями path,
+    необязательными name, weight и login. В path можно подставить
+    {author}, {post}, {group} и {page}. Подходят и строки лога
+    yatube.requests: лишние поля игнорируются.
+    """
+    mix = []
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("method", "GET") != "GET":
+                continue
+            mix.append({
+                "name": entry.get("name") or entry.get("view")
+                or entry["path"],
+                "path": entry["path"],
+                "weight": entry.get("weight", 1),
+                "login": entry.get("login", False),
+            })
+    if not mix:
+        raise CommandError(f"В {path} нет GET-запросов.")
+    return mix
+
+
+class Target:
+    """
+    Выполняет запросы через тестовый клиент Django в этом процессе или,
+    если задан url, по HTTP к запущенному WSGI-серверу.
+    """
+
+    def __init__(self, url, readers):
+        self.url = url.rstrip("/") if url else None
+        # Адрес не из INTERNAL_IPS, чтобы не включался debug toolbar.
+        self.clients = {None: Client(REMOTE_ADDR=CLIENT_ADDR)}
+        for user in readers:
+            client = Client(REMOTE_ADDR=CLIENT_ADDR)
+            client.force_login(user)
+            self.clients[user.pk] = client
+
+    def get(self, path, user_id):
+        client = self.clients[user_id]
+        if self.url is None:
+            response = client.get(path)
+            return response.status_code, response.get("Server-Timing", "")
+        request = Request(self.url + path)
+        session = client.cookies.get(settings.SESSION_COOKIE_NAME)
+        if session is not None:
+            request.add_header(
+                "Cookie", f"{settings.SESSION_COOKIE_NAME}={session.value}"
+            )
+        try:
+            with urlopen(request) as response:
+                response.read()
+                return response.status, response.headers.get(
+                    "Server-Timing", ""
+                )
+        except HTTPError as error:
+            return error.code, error.headers.get("Server-Timing", "")
+        except URLError as error:
+            raise CommandError(f"{self.url}: {error.reason}")
+
+
+class Command(BaseCommand):
+    help = ("Воспроизводит смесь запросов из jsonl и выводит задержки "
+            "p50/p95/p99 и число SQL-запросов по страницам.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("mix", nargs="?", default=DEFAULT_MIX,
+                            help="Файл со смесью запросов.")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=20,
+                            help="Запросов до начала замеров.")
+        parser.add_argument("--url", help="Адрес WSGI-сервера, например "
+                            "http://127.0.0.1:8000. По умолчанию запросы "
+                            "идут через тестовый клиент.")
+        parser.add_argument("--readers", type=int, default=10,
+                            help="Сколько пользователей входят на сайт "
+                            "для запросов с login.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--seed-users", type=int, default=0,
+                            help="Перед замером создать столько "
+                            "пользователей (см. posts/seed.py).")
+        parser.add_argument("--seed-posts", type=int, default=0)
+        parser.add_argument("--max-p95", type=float,
+                            help="Завершиться с ошибкой, если p95 "
+                            "какой-либо страницы больше, мс.")
+
+    def handle(self, *args, **options):
+        if options["seed_users"] or options["seed_posts"]:
+            seed(users=options["seed_users"], posts=options["seed_posts"],
+                 seed=options["seed"])
+        rng = random.Random(options["seed"])
+        mix = load_mix(options["mix"])
+        posts = list(
+            Post.objects.order_by("-pk")
+            .values_list("pk", "author__username")[:1000]
+        )
+        groups = list(Group.objects.values_list("slug", flat=True)[:1000])
+        if not posts or not groups:
+            raise CommandError("Нет постов или групп: заполните базу, "
+                               "например с --seed-users и --seed-posts.")
+        readers = User.objects.filter(
+            pk__in=Follow.objects.values("user_id")[:options["readers"]]
+        )
+        target = Target(options["url"], readers)
+        user_ids = [pk for pk in target.clients if pk is not None]
+
+        def next_request():
+            entry = rng.choices(mix, [entry["weight"] for entry in mix])[0]
+            post_id, author = rng.choice(posts)
+            path = entry["path"].format(author=author, post=post_id,
+                                        group=rng.choice(groups),
+                                        page=rng.randint(1, 5))
+            user_id = None
+            if entry["login"] and user_ids:
+                user_id = rng.choice(user_ids)
+            return entry["name"], path, user_id
+
+        # Строка лога на каждый запрос только мешает читать отчет.
+        logging.getLogger("yatube.requests").setLevel(logging.WARNING)
+        for _ in range(options["warmup"]):
+            _, path, user_id = next_request()
+            target.get(path, user_id)
+
+        results = {}
+        for _ in range(options["requests"]):
+            name, path, user_id = next_request()
+            start = time.perf_counter()
+            status, timing = target.get(path, user_id)
+            elapsed = (time.perf_counter() - start) * 1000
+            match = QUERIES.search(timing)
+            stats = results.setdefault(
+                name, {"times": [], "queries": [], "errors": 0}
+            )
+            stats["times"].append(elapsed)
+            if match:
+                stats["queries"].append(int(match.group(1)))
+            if status >= 400:
+                stats["errors"] += 1
+
+        self.report(results, options["max_p95"])
+
+    def report(self, results, max_p95):
+        self.stdout.write(
+            f"{'Страница':<28}{'запросов':>9}{'p50 мс':>9}{'p95 мс':>9}"
+            f"{'p99 мс':>9}{'SQL':>7}{'ошибок':>8}"
+        )
+        slow = []
+        for name, stats in sorted(results.items()):
+            times = sorted(stats["times"])
+            queries = stats["queries"]
+            sql = f"{sum(queries) / len(queries):.1f}" if queries else "-"
+            p95 = percentile(times, 95)
+            self.stdout.write(
+                f"{name:<28}{len(times):>9}{percentile(times, 50):>9.1f}"
+                f"{p95:>9.1f}{percentile(times, 99):>9.1f}{sql:>7}"
+                f"{stats['errors']:>8}"
+            )
+            if max_p95 is not None and p95 > max_p95:
+                slow.append(name)
+        if slow:
+            raise CommandError(
+                f"p95 больше {max_p95} мс: {', '.join(slow)}"
+            )
@@ -0,0 +1,128 @@
+import multiprocessing
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from posts.models import Comment, Follow, Post, User
+
+MARK = "bench_sqlite"
+
+
+def read(rng, user_ids):
+    """
+    Чтения как у страниц: главная, профиль и пост с комментариями.
+    """
+    choice = rng.random()
+    if choice < 0.5:
+        list(Post.objects.for_feed()[:settings.PER_PAGE])
+        Post.objects.count()
+    elif choice < 0.8:
+        list(Post.objects.for_feed()
+             .filter(author_id=rng.choice(user_ids))[:settings.PER_PAGE])
+    else:
+        post = Post.objects.order_by("-pk").first()
+        list(post.comments.select_related("author"))
+
+
+def write(rng, user_ids):
+    """
+    Записи как у new_post, add_comment и profile_follow, вместе
+    с сигналами, которые обновляют ленты, счетчики и индекс.
+    """
+    user_id = rng.choice(user_ids)
+    choice = rng.random()
+    if choice < 0.4:
+        Post.objects.create(text=f"{MARK} пост", author_id=user_id)
+    elif choice < 0.8:
+        post_id = Post.objects.order_by("-pk").values_list(
+            "pk", flat=True
+        ).first()
+        Comment.objects.create(post_id=post_id, author_id=user_id,
+                               text=f"{MARK} комментарий")
+    else:
+        author_id = rng.choice(user_ids)
+        if author_id != user_id:
+            Follow.objects.get_or_create(user_id=user_id,
+                                         author_id=author_id)
+
+
+def run_worker(args):
+    """
+    Выполняет в отдельном процессе чтения или записи, пока не выйдет
+    время, и считает операции и ошибки блокировки.
+    """
+    kind, number, seconds, user_ids, tuned = args
+    if not tuned:
+        connection.settings_dict["PRAGMAS"] = {}
+        connection.settings_dict["TRANSACTION_MODE"] = "DEFERRED"
+    rng = random.Random(number)
+    operation = read if kind == "reader" else write
+    stats = {"kind": kind, "ops": 0, "locked": 0}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            operation(rng, user_ids)
+            stats["ops"] += 1
+        except OperationalError:
+            stats["locked"] += 1
+    connection.close()
+    return stats
+
+
+class Command(BaseCommand):
+    help = ("Измеряет пропускную способность SQLite при одновременных "
+            "чтениях и записях из нескольких процессов. Пишет в базу, "
+            "запускайте на копии с тестовыми данными.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--untuned", action="store_true",
+                            help="Без PRAGMAS и в режиме журнала DELETE, "
+                            "для сравнения.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Команда измеряет только SQLite.")
+        user_ids = list(User.objects.values_list("pk", flat=True)[:1000])
+        if not user_ids or not Post.objects.exists():
+            raise CommandError("Нет данных: заполните базу seed_yatube.")
+        tuned = not options["untuned"]
+        with connection.cursor() as cursor:
+            # Режим журнала хранится в самом файле базы.
+            cursor.execute("PRAGMA journal_mode = "
+                           + ("WAL" if tuned else "DELETE"))
+            mode = cursor.fetchone()[0]
+        self.stdout.write(
+            f"Журнал: {mode}, читателей: {options['readers']}, "
+            f"писателей: {options['writers']}, {options['seconds']} с"
+        )
+        # Соединения с базой нельзя передавать в дочерние процессы.
+        connections.close_all()
+        jobs = (
+            [("reader", i, options["seconds"], user_ids, tuned)
+             for i in range(options["readers"])]
+            + [("writer", options["readers"] + i, options["seconds"],
+                user_ids, tuned) for i in range(options["writers"])]
+        )
+        context = multiprocessing.get_context("fork")
+        with context.Pool(len(jobs)) as pool:
+            results = pool.map(run_worker, jobs)
+
+        for kind, title in (("reader", "Чтения"), ("writer", "Записи")):
+            ops = sum(stats["ops"] for stats in results
+                      if stats["kind"] == kind)
+            locked = sum(stats["locked"] for stats in results
+                         if stats["kind"] == kind)
+            self.stdout.write(
+                f"{title}: {ops} операций, "
+                f"{ops / options['seconds']:.0f} в с, "
+                f"ошибок блокировки {locked}"
+            )
+
+        Post.objects.filter(text__startswith=MARK).delete()
+        Comment.objects.filter(text__startswith=MARK).delete()
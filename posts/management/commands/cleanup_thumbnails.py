@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts.models import Post
+from posts.thumbnails import file_size, release_images, stored_thumbnails
+
+UPLOAD_DIR = Post._meta.get_field("image").upload_to
+
+
+def walk(path):
+    """
+    Все файлы в каталоге хранилища path, включая подкаталоги.
+    """
+    try:
+        directories, files = default_storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(os.path.join(path, directory))
+
+
+def megabytes(size):
+    return f"{size / 2 ** 20:.1f} МБ"
+
+
+class Command(BaseCommand):
+    help = ("Удаляет картинки, на которые не ссылается ни один пост, "
+            "их миниатюры, миниатюры без записей в хранилище ключей sorl "
+            "и сами записи о пропавших файлах. Выводит освобожденное место.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только посчитать, ничего не удалять.")
+        parser.add_argument("--min-age", type=int, default=3600,
+                            help="Не трогать картинки и миниатюры моложе "
+                            "стольких секунд: пост с картинкой может быть "
+                            "еще не сохранен (загрузка, seed_yatube), "
+                            "а миниатюру может создавать фоновый поток.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        deadline = time.time() - options["min_age"]
+
+        def old(name):
+            modified = default_storage.get_modified_time(name)
+            return modified.timestamp() < deadline
+
+        referenced = set(
+            Post.objects.exclude(image="").exclude(image__isnull=True)
+            .values_list("image", flat=True).distinct().iterator()
+        )
+        orphans = [name for name in walk(UPLOAD_DIR)
+                   if name not in referenced and old(name)]
+        files, freed = release_images(orphans, dry_run=dry_run)
+        self.stdout.write(f"Картинки без постов: {len(orphans)}, "
+                          f"файлов с миниатюрами {files}, {megabytes(freed)}")
+
+        kvstore = default.kvstore
+        before = sum(1 for _ in kvstore._find_keys(identity="image"))
+        if not dry_run:
+            kvstore.cleanup()
+        after = sum(1 for _ in kvstore._find_keys(identity="image"))
+        self.stdout.write(f"Записей в хранилище ключей: {before} -> {after}")
+
+        known = set()
+        for key in kvstore._find_keys(identity="thumbnails"):
+            source = kvstore._get(key)
+            if source is not None:
+                known.update(thumbnail.name
+                             for thumbnail in stored_thumbnails(source))
+        stray = [
+            name for name in walk(sorl_settings.THUMBNAIL_PREFIX.rstrip("/"))
+            if name not in known and old(name)
+        ]
+        stray_size = sum(file_size(name) for name in stray)
+        if not dry_run:
+            for name in stray:
+                default_storage.delete(name)
+        self.stdout.write(f"Миниатюры без записей: {len(stray)}, "
+                          f"{megabytes(stray_size)}")
+
+        total = freed + stray_size
+        verb = "Можно освободить" if dry_run else "Освобождено"
+        self.stdout.write(self.style.SUCCESS(f"{verb}: {megabytes(total)}"))
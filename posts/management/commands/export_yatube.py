@@ -0,0 +1,32 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_rows
+
+
+class Command(BaseCommand):
+    help = ("Выгружает пользователей, группы, посты, комментарии и "
+            "подписки в NDJSON: по строке JSON на объект.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", nargs="?", default="-",
+                            help="Файл выгрузки, .gz сжимается. "
+                            "По умолчанию stdout.")
+        parser.add_argument("--chunk-size", type=int, default=5000,
+                            help="Строк, читаемых из базы за раз.")
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        # Отчет идет в stderr, чтобы не смешиваться с выгрузкой в stdout.
+        log = self.stderr.write
+        progress = log if options["verbosity"] > 1 else None
+        if path == "-":
+            total = export_rows(self.stdout, options["chunk_size"], log,
+                                progress)
+        else:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "wt", encoding="utf-8") as out:
+                total = export_rows(out, options["chunk_size"], log,
+                                    progress)
+        log(self.style.SUCCESS(f"Выгружено объектов: {total}"))
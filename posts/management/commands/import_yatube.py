@@ -0,0 +1,34 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import TransferError, import_rows
+
+
+class Command(BaseCommand):
+    help = ("Загружает выгрузку export_yatube пачками bulk_create и "
+            "пересобирает ленты, счетчики и поисковый индекс.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Файл выгрузки (.gz можно) "
+                            "или - для stdin.")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Строк в одной транзакции.")
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        log = self.stdout.write
+        progress = log if options["verbosity"] > 1 else None
+        try:
+            if path == "-":
+                total = import_rows(sys.stdin, options["batch_size"], log,
+                                    progress)
+            else:
+                opener = gzip.open if path.endswith(".gz") else open
+                with opener(path, "rt", encoding="utf-8") as lines:
+                    total = import_rows(lines, options["batch_size"], log,
+                                        progress)
+        except (OSError, TransferError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f"Загружено объектов: {total}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = "Заново строит полнотекстовый индекс постов и комментариев."
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError("Полнотекстовый индекс есть только в SQLite.")
+        with transaction.atomic():
+            total = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Проиндексировано документов: {total}."
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import reset_feeds
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает счетчики постов, подписчиков, подписок "
+            "и комментариев и исправляет расхождения.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users_fixed, posts_fixed = recount_all()
+        if users_fixed or posts_fixed:
+            # Страницы с неверными счетчиками остались бы в кэше.
+            reset_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f"Исправлено счетчиков: пользователей {users_fixed}, "
+            f"постов {posts_fixed}."
+        ))
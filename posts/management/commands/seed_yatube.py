@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts.seed import PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = ("Заполняет базу синтетическими пользователями, группами, "
+            "постами, комментариями, подписками и картинками.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--comments", type=int, default=50000)
+        parser.add_argument("--follows", type=int, default=20,
+                            help="Подписок у каждого нового пользователя.")
+        parser.add_argument("--images", type=int, default=0,
+                            help="Сколько разных картинок создать.")
+        parser.add_argument("--image-ratio", type=float, default=0.2,
+                            help="Доля постов с картинкой.")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Строк в одной транзакции.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        seed(
+            users=options["users"],
+            groups=options["groups"],
+            posts=options["posts"],
+            comments=options["comments"],
+            follows=options["follows"],
+            images=options["images"],
+            image_ratio=options["image_ratio"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+            progress=self.stdout.write if options["verbosity"] > 1
+            else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово. Пароль пользователей: {PASSWORD}"
+        ))
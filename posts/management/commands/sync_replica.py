@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube.routers import replica_enabled, sync_replica
+
+
+class Command(BaseCommand):
+    help = ("Копирует основную базу SQLite в файл реплики. С --interval "
+            "повторяет копирование, имитируя отстающую репликацию.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float,
+                            help="Копировать каждые столько секунд.")
+
+    def handle(self, *args, **options):
+        if not replica_enabled():
+            raise CommandError("Реплика не настроена: задайте путь к файлу "
+                               "в переменной окружения YATUBE_REPLICA.")
+        name = settings.DATABASES[settings.REPLICA_DATABASE]["NAME"]
+        while True:
+            start = time.monotonic()
+            sync_replica()
+            self.stdout.write(
+                f"Реплика {name} обновлена за "
+                f"{time.monotonic() - start:.2f} с"
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5("
+    "body, post_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_TABLE)
+    schema_editor.execute(
+        "INSERT INTO posts_search (rowid, body, post_id) "
+        "SELECT 2 * id, text, id FROM posts_post"
+    )
+    schema_editor.execute(
+        "INSERT INTO posts_search (rowid, body, post_id) "
+        "SELECT 2 * id + 1, text, post_id FROM posts_comment"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS posts_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_userstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:39
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model("posts", "Follow")
+    UserStats = apps.get_model("posts", "UserStats")
+    duplicates = (
+        Follow.objects.values("user", "author")
+        .annotate(first=Min("pk"), count=Count("pk"))
+        .filter(count__gt=1)
+    )
+    users = set()
+    for row in duplicates:
+        Follow.objects.filter(user=row["user"], author=row["author"]).exclude(
+            pk=row["first"]
+        ).delete()
+        users.update((row["user"], row["author"]))
+    for user_id in users:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author=user_id).count(),
+            following_count=Follow.objects.filter(user=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='posts_comme_post_id_944a68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='posts_post_group_i_1fdac4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='posts_post_author__7827da_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled_authors(apps, schema_editor):
+    UserStats = apps.get_model("posts", "UserStats")
+    UserStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_pulled_authors,
+                             migrations.RunPython.noop),
+    ]
@@ -5,6 +5,30 @@ from pytils.translit import slugify
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Посты со всем, что нужно для post_item.html: автор и группа
+        одним JOIN, число комментариев хранится в самом посте.
+        """
+        return self.select_related("author", "group")
+
+    def with_count(self, count):
+        """
+        Копия запроса, count() которой возвращает заранее известное
+        число из счетчиков, чтобы Paginator не делал COUNT(*) по таблице.
+        """
+        clone = self._chain()
+        clone._known_count = count
+        return clone
+
+    def count(self):
+        known = getattr(self, "_known_count", None)
+        if known is not None:
+            return known
+        return super().count()
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name="Запись",
                             help_text="Напишите что-нибудь здесь.")
@@ -19,9 +43,16 @@ class Post(models.Model):
                               " или оставьте поле пустым.")
     image = models.ImageField(verbose_name="Картинка",
                               upload_to="posts/", blank=True, null=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["group", "-pub_date"]),
+            models.Index(fields=["author", "-pub_date"]),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -52,6 +83,11 @@ class Comment(models.Model):
     created = models.DateTimeField(verbose_name="Дата публикации",
                                    auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "created"]),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -63,3 +99,48 @@ class Follow(models.Model):
     author = models.ForeignKey(User, verbose_name="Автор",
                                on_delete=models.CASCADE,
                                related_name="following")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="unique_follow"),
+        ]
+
+
+class FeedEntry(models.Model):
+    """
+    Запись материализованной ленты подписок: пост автора, на которого
+    подписан пользователь. Заполняется при публикации поста и при
+    подписке, поэтому лента читается одним запросом по индексу.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="feed_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-pub_date"]
+        unique_together = ["user", "post"]
+        indexes = [
+            models.Index(fields=["user", "-pub_date"]),
+            models.Index(fields=["user", "author"]),
+        ]
+
+
+class UserStats(models.Model):
+    """
+    Счетчики пользователя, которые выводятся на карточке автора.
+    Поддерживаются сигналами (см. posts/signals.py), расхождения
+    исправляет команда recount_stats.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Хотя бы один пост автора не был разложен по лентам подписчиков
+    # (см. posts/feed.py), поэтому его посты подтягиваются при чтении.
+    feed_pulled = models.BooleanField(default=False)
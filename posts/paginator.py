@@ -0,0 +1,171 @@
+import base64
+import binascii
+import json
+
+from collections.abc import Sequence
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(direction, value, pk):
+    raw = json.dumps([direction, value.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Возвращает (направление, дата, pk) или None для битого курсора.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, value, pk = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode()
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    value = parse_datetime(value) if isinstance(value, str) else None
+    if direction not in ("next", "prev") or value is None:
+        return None
+    if not isinstance(pk, int):
+        return None
+    return direction, value, pk
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """
+    Номера страниц для ссылок пагинатора: по on_ends страниц с краев
+    и по on_each_side соседей текущей, пропуски обозначены None. Длина
+    списка не зависит от числа страниц.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    window = []
+    # Многоточие ставится, только если скрывает хотя бы две страницы.
+    if number > on_each_side + on_ends + 2:
+        window += list(range(1, on_ends + 1)) + [None]
+        window += range(number - on_each_side, number + 1)
+    else:
+        window += range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        window += range(number + 1, number + on_each_side + 1)
+        window += [None] + list(range(num_pages - on_ends + 1,
+                                      num_pages + 1))
+    else:
+        window += range(number + 1, num_pages + 1)
+    return window
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return "<CursorPage of %s items>" % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        # Как в django.core.paginator.Page: QuerySet не умеет
+        # отрицательные индексы, а список уже прочитан.
+        if not isinstance(self.object_list, list):
+            self.object_list = list(self.object_list)
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (дата, id) без COUNT и OFFSET:
+    каждая страница читается одним запросом по индексу, независимо
+    от того, насколько далеко пролистана лента. По умолчанию новые
+    записи идут первыми, с descending=False - старые.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, date_field="pub_date",
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        self.descending = descending
+
+    def _ordered(self, forward):
+        sign = "-" if forward == self.descending else ""
+        return self.object_list.order_by(f"{sign}{self.date_field}",
+                                         f"{sign}pk")
+
+    def _beyond(self, forward, value, pk):
+        lookup = "lt" if forward == self.descending else "gt"
+        # OR сам по себе не задает диапазон индекса, и SQLite читал бы
+        # индекс по дате с самого начала. Условие lte/gte с тем же
+        # результатом позволяет начать чтение сразу с курсора.
+        return Q(**{f"{self.date_field}__{lookup}e": value}) & (
+            Q(**{f"{self.date_field}__{lookup}": value})
+            | Q(**{self.date_field: value, f"pk__{lookup}": pk})
+        )
+
+    def _cursor(self, direction, item):
+        if isinstance(item, dict):
+            # Строки values() вместо объектов модели.
+            return encode_cursor(direction, item[self.date_field],
+                                 item["pk"])
+        return encode_cursor(direction, getattr(item, self.date_field),
+                             item.pk)
+
+    def after(self, cursor):
+        """
+        Все записи после курсора next (или с начала) в порядке ленты,
+        без ограничения по per_page: для потоковой выдачи, которая сама
+        решает, где остановиться, и берет курсор из cursor_for.
+        """
+        items = self._ordered(forward=True)
+        position = decode_cursor(cursor)
+        if position is not None and position[0] == "next":
+            items = items.filter(self._beyond(True, *position[1:]))
+        return items
+
+    def cursor_for(self, item):
+        return self._cursor("next", item)
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor)
+
+        if position is None or position[0] == "next":
+            items = self._ordered(forward=True)
+            if position is not None:
+                items = items.filter(self._beyond(True, *position[1:]))
+            rows = list(items[:self.per_page + 1])
+            has_more_after = len(rows) > self.per_page
+            has_more_before = position is not None
+            rows = object_list = rows[:self.per_page]
+        else:
+            rows = list(
+                self._ordered(forward=False)
+                .filter(self._beyond(False, *position[1:]))
+                [:self.per_page + 1]
+            )
+            has_more_after, has_more_before = True, len(rows) > self.per_page
+            rows = object_list = rows[:self.per_page][::-1]
+
+        next_cursor = previous_cursor = None
+        if rows and has_more_after:
+            next_cursor = self._cursor("next", rows[-1])
+        if rows and has_more_before:
+            previous_cursor = self._cursor("prev", rows[0])
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
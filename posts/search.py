@@ -0,0 +1,148 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Comment, Post
+
+# Посты и комментарии лежат в одной таблице FTS5: rowid поста равен
+# 2 * pk, комментария - 2 * pk + 1, в post_id всегда id поста.
+TABLE = "posts_search"
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "body, post_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+)
+
+DROP_TABLE = f"DROP TABLE IF EXISTS {TABLE}"
+
+WORD = re.compile(r"\w+")
+
+
+def enabled():
+    return connection.vendor == "sqlite"
+
+
+def post_rowid(post_id):
+    return 2 * post_id
+
+
+def comment_rowid(comment_id):
+    return 2 * comment_id + 1
+
+
+def _replace(rowid, body, post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [rowid])
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, body, post_id) VALUES (%s, %s, %s)",
+            [rowid, body, post_id],
+        )
+
+
+def index_post(post):
+    if enabled():
+        _replace(post_rowid(post.pk), post.text, post.pk)
+
+
+def index_comment(comment):
+    if enabled():
+        _replace(comment_rowid(comment.pk), comment.text, comment.post_id)
+
+
+def unindex(rowid):
+    if enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [rowid])
+
+
+def rebuild():
+    """
+    Заново строит индекс по всем постам и комментариям.
+    Возвращает число проиндексированных документов.
+    """
+    posts, comments = Post._meta.db_table, Comment._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_TABLE)
+        cursor.execute(CREATE_TABLE)
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, body, post_id) "
+            f"SELECT 2 * id, text, id FROM {posts}"
+        )
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, body, post_id) "
+            f"SELECT 2 * id + 1, text, post_id FROM {comments}"
+        )
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """
+    Переводит строку поиска в запрос FTS5: каждое слово в кавычках,
+    слова объединяются через AND, к последнему добавляется поиск
+    по префиксу.
+    """
+    words = WORD.findall(query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchResults:
+    """
+    Результаты поиска в порядке релевантности. Поддерживает count()
+    и срезы, поэтому подходит для Paginator. Из индекса одним запросом
+    читаются SEARCH_MAX_RESULTS лучших документов (ORDER BY rank LIMIT),
+    повторы постов убираются в Python, так что число результатов
+    не больше SEARCH_MAX_RESULTS и считается без COUNT по всем
+    совпадениям.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.expression = match_expression(query)
+        self._ids = None
+
+    def post_ids(self):
+        """
+        id найденных постов: пост попадает в список по лучшему из своих
+        документов (текст поста или комментарий).
+        """
+        if self._ids is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s "
+                    "ORDER BY rank LIMIT %s",
+                    [self.expression, settings.SEARCH_MAX_RESULTS],
+                )
+                self._ids = list(dict.fromkeys(
+                    row[0] for row in cursor.fetchall()
+                ))
+        return self._ids
+
+    def count(self):
+        if not self.expression:
+            return 0
+        if not enabled():
+            return Post.objects.filter(
+                text__icontains=self.query
+            )[:settings.SEARCH_MAX_RESULTS].count()
+        return len(self.post_ids())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.expression:
+            return []
+        if not enabled():
+            return list(Post.objects.for_feed()
+                        .filter(text__icontains=self.query)[index])
+        ids = self.post_ids()[index]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
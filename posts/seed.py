@@ -0,0 +1,243 @@
+import random
+import time
+
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max, Min
+from PIL import Image, ImageDraw
+
+from . import counters, feed, search
+from .cache import reset_feeds
+from .models import Comment, Follow, Group, Post, User
+
+PASSWORD = "yatube"
+
+WORDS = (
+    "кот собака дом лес река город море солнце книга музыка утро вечер "
+    "дорога поезд чай кофе работа отпуск друг праздник снег дождь"
+).split()
+
+
+def zipf_weights(count):
+    """
+    Накопленные веса для выбора авторов: немногие популярные пишут
+    и собирают подписчиков больше остальных, как в настоящей соцсети.
+    """
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+def batches(objects, size):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max("pk"))["last"] or 0
+
+
+def rebuild_derived(log):
+    """
+    Пересобирает то, что обычно поддерживают сигналы: ленты подписок,
+    счетчики и поисковый индекс, и сбрасывает кэш лент. Нужна после
+    bulk_create.
+    """
+    start = time.monotonic()
+    # Счетчики первыми: rebuild помечает авторов в UserStats.
+    users_fixed, posts_fixed = counters.recount_all()
+    log(f"Пересчитаны счетчики: пользователей {users_fixed}, "
+        f"постов {posts_fixed}")
+    entries = feed.rebuild()
+    log(f"Записей в лентах: {entries}")
+    if search.enabled():
+        log(f"Проиндексировано документов: {search.rebuild()}")
+    reset_feeds()
+    log(f"Ленты, счетчики и индекс: {time.monotonic() - start:.1f} с")
+
+
+class Seeder:
+    """
+    Генерирует синтетические данные для нагрузочных тестов. Строки
+    пишутся через bulk_create пачками по batch_size, каждая пачка
+    в своей транзакции. При одном и том же seed и одной и той же
+    исходной базе результат одинаковый.
+
+    bulk_create не вызывает сигналы, поэтому после загрузки нужно
+    вызвать finish: он пересобирает ленты, счетчики и поисковый индекс.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, log=None, progress=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.progress = progress or (lambda message: None)
+        self.images = []
+
+    def insert(self, model, objects, total):
+        """
+        Пишет объекты пачками и возвращает диапазон новых pk.
+        """
+        before = last_pk(model)
+        start = time.monotonic()
+        done = 0
+        for batch in batches(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            done += len(batch)
+            self.progress(
+                f"{model._meta.verbose_name_plural}: {done}/{total}"
+            )
+        elapsed = time.monotonic() - start
+        self.log(f"{model._meta.verbose_name_plural}: {done} за "
+                 f"{elapsed:.1f} с ({done / max(elapsed, 1e-6):.0f} в с)")
+        # Номера удаленных строк не переиспользуются, поэтому новые
+        # начинаются не обязательно сразу после прежнего максимума.
+        new = model.objects.filter(pk__gt=before).aggregate(
+            first=Min("pk"), last=Max("pk")
+        )
+        if new["first"] is None:
+            return range(0)
+        return range(new["first"], new["last"] + 1)
+
+    def sentence(self, words=12):
+        return " ".join(
+            self.rng.choice(WORDS) for _ in range(words)
+        ).capitalize()
+
+    def authors(self, k=1, popular=False):
+        """
+        Случайные пользователи с распределением Ципфа. Самые пишущие
+        и самые популярные авторы - разные люди, иначе раскладка постов
+        по лентам растет как произведение двух хвостов.
+        """
+        users = self.popular_ids if popular else self.user_ids
+        return self.rng.choices(users, cum_weights=self.weights, k=k)
+
+    def load_users(self):
+        self.user_ids = list(
+            User.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        self.popular_ids = self.user_ids[:]
+        self.rng.shuffle(self.popular_ids)
+        self.weights = zipf_weights(len(self.user_ids))
+
+    def create_users(self, count):
+        offset = User.objects.count()
+        password = make_password(PASSWORD)
+        new = self.insert(User, (
+            User(username=f"user{offset + i}", password=password)
+            for i in range(count)
+        ), count)
+        self.load_users()
+        return new
+
+    def create_groups(self, count):
+        offset = Group.objects.count()
+        self.insert(Group, (
+            Group(title=f"Группа {offset + i}", slug=f"group-{offset + i}",
+                  description=self.sentence())
+            for i in range(count)
+        ), count)
+
+    def create_images(self, count):
+        """
+        Сохраняет count картинок, которые затем достаются части постов.
+        """
+        for i in range(count):
+            image = Image.new("RGB", (1200, 800), tuple(
+                self.rng.randrange(256) for _ in range(3)
+            ))
+            draw = ImageDraw.Draw(image)
+            for _ in range(5):
+                x, y = self.rng.randrange(1200), self.rng.randrange(800)
+                draw.ellipse(
+                    [x, y, x + self.rng.randint(50, 400),
+                     y + self.rng.randint(50, 400)],
+                    fill=tuple(self.rng.randrange(256) for _ in range(3)),
+                )
+            content = BytesIO()
+            image.save(content, "JPEG", quality=85)
+            self.images.append(default_storage.save(
+                f"posts/seed_{self.seed}_{i}.jpg",
+                ContentFile(content.getvalue()),
+            ))
+        self.log(f"Картинок: {len(self.images)}")
+
+    def create_posts(self, count, image_ratio=0.0):
+        group_ids = list(Group.objects.values_list("pk", flat=True)) + [None]
+
+        def posts():
+            for author_id in self.authors_stream(count):
+                image = ""
+                if self.images and self.rng.random() < image_ratio:
+                    image = self.rng.choice(self.images)
+                yield Post(text=self.sentence(self.rng.randint(5, 60)),
+                           author_id=author_id,
+                           group_id=self.rng.choice(group_ids),
+                           image=image)
+
+        return self.insert(Post, posts(), count)
+
+    def authors_stream(self, count):
+        while count > 0:
+            size = min(count, self.batch_size)
+            yield from self.authors(size)
+            count -= size
+
+    def create_comments(self, count, post_ids):
+        if not post_ids:
+            return
+
+        def comments():
+            for author_id in self.authors_stream(count):
+                yield Comment(post_id=self.rng.choice(post_ids),
+                              author_id=author_id,
+                              text=self.sentence(self.rng.randint(3, 20)))
+
+        self.insert(Comment, comments(), count)
+
+    def create_follows(self, per_user, user_ids):
+        """
+        Каждый из user_ids подписывается на per_user авторов, популярные
+        авторы выпадают чаще. Повторы и подписки на себя отбрасываются.
+        """
+        def follows():
+            for user_id in user_ids:
+                authors = dict.fromkeys(self.authors(per_user, popular=True))
+                for author_id in authors:
+                    if author_id != user_id:
+                        yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows(), per_user * len(user_ids))
+
+    def finish(self):
+        rebuild_derived(self.log)
+
+
+def seed(users=100, groups=10, posts=1000, comments=0, follows=10,
+         images=0, image_ratio=0.0, seed=0, batch_size=5000, log=None,
+         progress=None):
+    """
+    Заполняет базу синтетическими данными: пользователи user0..userN
+    с паролем PASSWORD, группы, посты, комментарии, подписки и картинки.
+    Новые пользователи подписываются на follows авторов каждый.
+    """
+    seeder = Seeder(seed, batch_size, log, progress)
+    new_users = seeder.create_users(users)
+    if not seeder.user_ids:
+        return
+    seeder.create_groups(groups)
+    seeder.create_images(images)
+    new_posts = seeder.create_posts(posts, image_ratio)
+    seeder.create_comments(comments, new_posts)
+    seeder.create_follows(follows, new_users)
+    seeder.finish()
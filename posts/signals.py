@@ -0,0 +1,139 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed, search, thumbnails
+from .cache import adjust_counts, bump_feeds, forget_post_item, post_feeds
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля, которые выводятся на закэшированных страницах лент.
+SHOWN_FIELDS = {
+    Group: ("title", "slug", "description"),
+    User: ("username", "first_name", "last_name"),
+}
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def shown_fields_changing(sender, instance, update_fields=None, **kwargs):
+    fields = SHOWN_FIELDS[sender]
+    instance._shown_changed = False
+    # Вход пользователя сохраняет только last_login.
+    if instance.pk is None or (update_fields is not None
+                               and not set(fields) & set(update_fields)):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        *fields
+    ).first()
+    instance._shown_changed = previous not in (
+        None, tuple(getattr(instance, field) for field in fields)
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    if instance._shown_changed:
+        authors = Post.objects.filter(group=instance).values_list(
+            "author_id", flat=True
+        ).distinct()
+        bump_feeds("index", f"group:{instance.pk}",
+                   *(f"profile:{author_id}" for author_id in authors))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif instance._shown_changed:
+        groups = Post.objects.filter(
+            author=instance, group__isnull=False
+        ).values_list("group_id", flat=True).distinct()
+        commented = Comment.objects.filter(author=instance).values_list(
+            "post_id", flat=True
+        ).distinct()
+        bump_feeds("index", f"profile:{instance.pk}",
+                   *(f"group:{group_id}" for group_id in groups),
+                   *(f"post:{post_id}" for post_id in commented))
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("group_id", "image").first()
+        ) or (None, "")
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    names = post_feeds(instance.author_id, instance.group_id)
+    search.index_post(instance)
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        feed.fan_out(instance)
+        adjust_counts(names, 1)
+    else:
+        forget_post_item(instance)
+        previous_image = getattr(instance, "_previous_image", "")
+        if previous_image and previous_image != instance.image.name:
+            thumbnails.release_later(previous_image)
+        previous_group_id = getattr(instance, "_previous_group_id", None)
+        if previous_group_id != instance.group_id:
+            if previous_group_id:
+                names.append(f"group:{previous_group_id}")
+                adjust_counts([f"group:{previous_group_id}"], -1)
+            if instance.group_id:
+                adjust_counts([f"group:{instance.group_id}"], 1)
+    bump_feeds(*names, f"post:{instance.pk}")
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    search.unindex(search.post_rowid(instance.pk))
+    forget_post_item(instance)
+    thumbnails.release_later(instance.image.name)
+    names = post_feeds(instance.author_id, instance.group_id)
+    adjust_counts(names, -1)
+    bump_feeds(*names, f"post:{instance.pk}")
+
+
+def comments_changed(post_id, delta):
+    counters.bump_post(post_id, delta)
+    post = Post.objects.filter(pk=post_id).values("author_id",
+                                                  "group_id").first()
+    if post is not None:
+        bump_feeds(*post_feeds(post["author_id"], post["group_id"]),
+                   f"post:{post_id}")
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    search.index_comment(instance)
+    if created:
+        comments_changed(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    search.unindex(search.comment_rowid(instance.pk))
+    comments_changed(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+        bump_feeds(f"profile:{instance.author_id}",
+                   f"profile:{instance.user_id}")
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+    feed.prune(instance.user_id, instance.author_id)
+    bump_feeds(f"profile:{instance.author_id}",
+               f"profile:{instance.user_id}")
@@ -0,0 +1,64 @@
+from django import template
+
+from posts import thumbnails
+from posts.paginator import page_window as window_numbers
+
+register = template.Library()
+
+
+@register.filter
+def is_author(post, user):
+    return user.is_authenticated and post.author_id == user.pk
+
+
+def ready_images(context, image):
+    """
+    Готовые миниатюры картинки из thumbnails.ready_images. На странице
+    ленты при первом обращении они читаются сразу для всех постов
+    страницы и запоминаются в ней, а не по запросу на каждую картинку.
+    """
+    page = context.get("page")
+    ready = getattr(page, "ready_images", None)
+    if ready is None:
+        images = [getattr(item, "image", None) for item in page or ()]
+        ready = thumbnails.ready_images([image for image in images
+                                         if image])
+        if page is not None:
+            page.ready_images = ready
+    if image.name not in ready:
+        ready.update(thumbnails.ready_images([image]))
+    return ready[image.name]
+
+
+@register.simple_tag(takes_context=True)
+def feed_thumbnail(context, image):
+    """
+    Готовая миниатюра для ленты. Если ее еще нет, ставит создание
+    в фоновую очередь и возвращает None: шаблон покажет оригинал.
+    """
+    if not image:
+        return None
+    thumbnail, _ = ready_images(context, image)
+    if thumbnail is None:
+        thumbnails.schedule(image.instance)
+    return thumbnail
+
+
+@register.simple_tag(takes_context=True)
+def feed_srcset(context, image):
+    """
+    Значение srcset из готовых WebP-вариантов картинки.
+    """
+    if not image:
+        return ""
+    _, variants = ready_images(context, image)
+    return ", ".join(f"{thumbnail.url} {width}w"
+                     for width, thumbnail in variants)
+
+
+@register.simple_tag
+def page_window(page):
+    """
+    Номера страниц вокруг текущей для paginator.html, None - пропуск.
+    """
+    return window_numbers(page.number, page.paginator.num_pages)
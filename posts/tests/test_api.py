@@ -0,0 +1,120 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def read_json(response):
+    return json.loads(b"".join(response.streaming_content))
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="api_author")
+        cls.reader = User.objects.create_user(username="api_reader")
+        cls.group = Group.objects.create(title="Группа API", slug="api",
+                                         description="Группа для API")
+        for i in range(25):
+            Post.objects.create(text=f"Пост {i}", author=cls.author,
+                                group=cls.group if i % 2 else None)
+        cls.post = Post.objects.order_by("-pk").first()
+        for i in range(3):
+            Comment.objects.create(post=cls.post, text=f"Комментарий {i}",
+                                   author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.expected = list(Post.objects.order_by("-pub_date", "-pk")
+                            .values_list("pk", flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, kwargs=None, **params):
+        return self.client.get(reverse(f"api_v1:{name}", kwargs=kwargs),
+                               params)
+
+    def walk(self, name, kwargs=None, **params):
+        seen, cursor = [], None
+        while True:
+            if cursor:
+                params["cursor"] = cursor
+            data = read_json(self.get(name, kwargs, **params))
+            seen.extend(post["id"] for post in data["results"])
+            cursor = data["next"]
+            if cursor is None:
+                return seen
+
+    def test_feeds_walk_by_cursor(self):
+        """Ленты API обходятся по курсору без пропусков и повторов"""
+        self.client.force_login(ApiTests.reader)
+        author = {"username": ApiTests.author.username}
+        group = {"slug": ApiTests.group.slug}
+        in_group = set(ApiTests.group.posts.values_list("pk", flat=True))
+        cases = [
+            ("posts", None, ApiTests.expected),
+            ("profile_posts", author, ApiTests.expected),
+            ("follow", None, ApiTests.expected),
+            ("group_posts", group,
+             [pk for pk in ApiTests.expected if pk in in_group]),
+        ]
+        for name, kwargs, expected in cases:
+            with self.subTest(name=name):
+                self.assertEqual(self.walk(name, kwargs, limit=10), expected)
+
+    def test_sparse_fields(self):
+        """?fields= оставляет в ответе только запрошенные поля"""
+        data = read_json(self.get("posts", fields="id,author", limit=1))
+        self.assertEqual(data["results"], [{
+            "id": ApiTests.expected[0],
+            "author": ApiTests.author.username,
+        }])
+
+    def test_projection_reads_only_requested_columns(self):
+        """Запрос к базе читает только нужные столбцы"""
+        with CaptureQueriesContext(connection) as queries:
+            read_json(self.get("posts", fields="id", limit=5))
+        sql = queries[-1]["sql"]
+        self.assertNotIn('"posts_post"."text"', sql)
+        self.assertNotIn("auth_user", sql)
+
+    def test_post_with_comments(self):
+        """Пост отдается вместе с первой страницей комментариев"""
+        data = read_json(self.get("post", {"post_id": ApiTests.post.pk}))
+        self.assertEqual(data["post"]["text"], ApiTests.post.text)
+        self.assertEqual(
+            [comment["text"] for comment in data["comments"]["results"]],
+            ["Комментарий 0", "Комментарий 1", "Комментарий 2"],
+        )
+        self.assertIsNone(data["comments"]["next"])
+
+        comments = read_json(self.get(
+            "post_comments", {"post_id": ApiTests.post.pk},
+            limit=2, fields="text",
+        ))
+        self.assertEqual(comments["results"], [{"text": "Комментарий 0"},
+                                               {"text": "Комментарий 1"}])
+        self.assertIsNotNone(comments["next"])
+
+    def test_errors(self):
+        """Ошибки запроса отдаются в JSON с нужным кодом"""
+        cases = [
+            (self.get("posts", fields="password"), 400),
+            (self.get("posts", limit="0"), 400),
+            (self.get("posts", limit="много"), 400),
+            (self.get("follow"), 401),
+            (self.get("post", {"post_id": 0}), 404),
+            (self.get("group_posts", {"slug": "missing"}), 404),
+        ]
+        for response, status in cases:
+            with self.subTest(status=status):
+                self.assertEqual(response.status_code, status)
+                self.assertIn("error", response.json())
+        response = self.client.post(reverse("api_v1:posts"))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,47 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.feed import follow_feed
+from posts.management.commands.bench_requests import percentile
+from posts.models import FeedEntry, Follow, Post, User
+from posts.seed import seed
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile(self):
+        """Процентили считаются по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_seed(self):
+        """Синтетические данные согласованы: ленты и счетчики заполнены"""
+        seed(users=20, groups=3, posts=200, follows=3, seed=1)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 200)
+        follow = Follow.objects.select_related("user", "author").first()
+        self.assertEqual(
+            set(follow_feed(follow.user).filter(author=follow.author)),
+            set(follow.author.posts.all()),
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+        author = follow.author
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+        self.assertEqual(author.stats.followers_count,
+                         author.following.count())
+
+    def test_replay(self):
+        """Отчет содержит задержки и число SQL-запросов по страницам"""
+        out = StringIO()
+        call_command("bench_requests", "--seed-users", 20, "--seed-posts",
+                     100, "--requests", 30, "--warmup", 0, stdout=out)
+        report = out.getvalue().splitlines()
+        self.assertIn("p95", report[0])
+        rows = {line[:28].strip(): line.split() for line in report[1:]}
+        self.assertIn("index", rows)
+        for name, row in rows.items():
+            with self.subTest(name=name):
+                self.assertEqual(row[-1], "0")
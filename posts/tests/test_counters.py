@@ -0,0 +1,102 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="counter_author")
+        cls.reader = User.objects.create_user(username="counter_reader")
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_signals_keep_counters(self):
+        """Счетчики меняются при создании и удалении объектов"""
+        author, reader = CountersTests.author, CountersTests.reader
+        post = Post.objects.create(text="Пост", author=author)
+        comment = Comment.objects.create(post=post, author=reader,
+                                         text="Комментарий")
+        Follow.objects.create(user=reader, author=author)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(author).posts_count, 1)
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(self.stats(reader).following_count, 1)
+
+        comment.delete()
+        Follow.objects.filter(user=reader).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(author).followers_count, 0)
+        self.assertEqual(self.stats(reader).following_count, 0)
+
+        post.delete()
+        self.assertEqual(self.stats(author).posts_count, 0)
+
+    def test_recount_stats_repairs_drift(self):
+        """Команда recount_stats исправляет расхождения"""
+        author = CountersTests.author
+        post = Post.objects.create(text="Пост", author=author)
+        Comment.objects.create(post=post, author=author, text="Текст")
+        UserStats.objects.filter(user=author).update(posts_count=42)
+        UserStats.objects.filter(user=CountersTests.reader).delete()
+        Post.objects.filter(pk=post.pk).update(comment_count=7)
+        url = reverse("profile", kwargs={"username": author.username})
+        self.assertContains(Client().get(url), "Комментариев: 7")
+
+        out = StringIO()
+        call_command("recount_stats", stdout=out)
+        # Закэшированная страница со старыми счетчиками сброшена.
+        self.assertContains(Client().get(url), "Комментариев: 1")
+        post.refresh_from_db()
+        self.assertEqual(self.stats(author).posts_count, 1)
+        self.assertTrue(
+            UserStats.objects.filter(user=CountersTests.reader).exists()
+        )
+        self.assertEqual(post.comment_count, 1)
+        self.assertIn("пользователей 2, постов 1", out.getvalue())
+
+    def test_author_card_does_not_count(self):
+        """Карточка автора не выполняет COUNT-запросов"""
+        author = CountersTests.author
+        post = Post.objects.create(text="Пост", author=author)
+        urls = [
+            reverse("profile", kwargs={"username": author.username}),
+            reverse("post", kwargs={"username": author.username,
+                                    "post_id": post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertContains(response, "Записей 1")
+                counts = [query["sql"] for query in queries
+                          if "COUNT(" in query["sql"]]
+                self.assertEqual(counts, [])
+
+    def test_user_without_stats(self):
+        """Профиль и пост автора без строки счетчиков открываются"""
+        User.objects.bulk_create([User(username="bulk_author")])
+        author = User.objects.get(username="bulk_author")
+        post = Post.objects.create(text="Пост", author=author)
+        Follow.objects.create(user=CountersTests.reader, author=author)
+        urls = [
+            reverse("profile", kwargs={"username": author.username}),
+            reverse("post", kwargs={"username": author.username,
+                                    "post_id": post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertContains(response, "Записей 1")
+                self.assertContains(response, "Подписчиков: 1")
+        self.assertEqual(self.stats(author).followers_count, 1)
@@ -0,0 +1,105 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feed
+from posts.feed import pulled_authors
+from posts.models import FeedEntry, Follow, Post, User
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="feed_author")
+        cls.reader = User.objects.create_user(username="feed_reader")
+        cls.old_post = Post.objects.create(text="Старый пост",
+                                           author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowFeedTests.reader)
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            "profile_follow",
+            kwargs={"username": FollowFeedTests.author.username}
+        ))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает"""
+        reader = FollowFeedTests.reader
+        self.follow()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=reader, post=FollowFeedTests.old_post
+        ).exists())
+
+        self.reader_client.get(reverse(
+            "profile_unfollow",
+            kwargs={"username": FollowFeedTests.author.username}
+        ))
+        self.assertFalse(FeedEntry.objects.filter(user=reader).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        self.follow()
+        post = Post.objects.create(text="Новый пост",
+                                   author=FollowFeedTests.author)
+        response = self.reader_client.get(reverse("follow_index"))
+        self.assertEqual(response.context["page"][0], post)
+        self.assertEqual(len(response.context["page"]), 2)
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты авторов с большим числом подписчиков читаются напрямую"""
+        Follow.objects.create(user=FollowFeedTests.reader,
+                              author=FollowFeedTests.author)
+        post = Post.objects.create(text="Пост без раскладки",
+                                   author=FollowFeedTests.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        response = self.reader_client.get(reverse("follow_index"))
+        self.assertEqual(list(response.context["page"]),
+                         [post, FollowFeedTests.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_pulled_authors_do_not_count_followers(self):
+        """Авторы без раскладки находятся по счетчику, без COUNT"""
+        Follow.objects.create(user=FollowFeedTests.reader,
+                              author=FollowFeedTests.author)
+        with CaptureQueriesContext(connection) as queries:
+            authors = pulled_authors(FollowFeedTests.reader)
+        self.assertEqual(authors, [FollowFeedTests.author.pk])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("COUNT", queries[0]["sql"])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_skipped_posts_stay_after_unfollow(self):
+        """Пост, не разложенный по лентам, виден и после отписок"""
+        other = User.objects.create_user(username="feed_other")
+        Follow.objects.create(user=FollowFeedTests.reader,
+                              author=FollowFeedTests.author)
+        Follow.objects.create(user=other, author=FollowFeedTests.author)
+        post = Post.objects.create(text="Пост без раскладки",
+                                   author=FollowFeedTests.author)
+        Follow.objects.get(user=other).delete()
+
+        response = self.reader_client.get(reverse("follow_index"))
+        self.assertIn(post, response.context["page"])
+
+    @override_settings(FEED_BACKFILL_LIMIT=1)
+    def test_rebuild_keeps_backfill_limit(self):
+        """Пересборка кладет в ленту столько же постов, сколько подписка"""
+        post = Post.objects.create(text="Новый пост",
+                                   author=FollowFeedTests.author)
+        Follow.objects.create(user=FollowFeedTests.reader,
+                              author=FollowFeedTests.author)
+        backfilled = list(FeedEntry.objects.values_list("post_id", flat=True))
+
+        feed.rebuild()
+        self.assertEqual(
+            list(FeedEntry.objects.values_list("post_id", flat=True)),
+            backfilled,
+        )
+        self.assertEqual(backfilled, [post.pk])
@@ -0,0 +1,95 @@
+import time
+
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Group, Post, User
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+class SyndicationFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="feed_author")
+        cls.group = Group.objects.create(title="Группа лент", slug="feeds",
+                                         description="Группа для лент")
+        cls.post = Post.objects.create(text="Пост в ленте",
+                                       author=cls.author, group=cls.group)
+        cls.rss = [
+            reverse("index_rss"),
+            reverse("group_rss", kwargs={"slug": cls.group.slug}),
+            reverse("profile_rss", kwargs={"username": cls.author.username}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def titles(self, url):
+        root = ElementTree.fromstring(self.client.get(url).content)
+        return [item.findtext("title") for item in root.iter("item")]
+
+    def test_rss_lists_posts(self):
+        """RSS ленты, группы и профиля содержат посты"""
+        for url in SyndicationFeedTests.rss:
+            with self.subTest(url=url):
+                self.assertEqual(self.titles(url), ["Пост в ленте"])
+
+    def test_atom(self):
+        """Atom-лента отдает записи и подзаголовок"""
+        response = self.client.get(
+            reverse("group_atom", kwargs={"slug": "feeds"})
+        )
+        self.assertEqual(response["Content-Type"],
+                         "application/atom+xml; charset=utf-8")
+        root = ElementTree.fromstring(response.content)
+        self.assertEqual(root.findtext(f"{ATOM}subtitle"), "Группа для лент")
+        self.assertEqual(len(root.findall(f"{ATOM}entry")), 1)
+
+    def test_cached_until_post_saved(self):
+        """Лента берется из кэша без запросов, пока пост не сохранят"""
+        url = reverse("index_rss")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), 0)
+
+        Post.objects.create(text="Новый пост",
+                            author=SyndicationFeedTests.author)
+        self.assertEqual(self.titles(url), ["Новый пост", "Пост в ленте"])
+
+    def test_conditional_get(self):
+        """Неизменившаяся лента отдает 304"""
+        for url in SyndicationFeedTests.rss:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                again = self.client.get(url,
+                                        HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(again.status_code, 304)
+
+    def test_post_in_same_second(self):
+        """Пост в ту же секунду не прячется за If-Modified-Since"""
+        url = reverse("index_rss")
+        Post.objects.create(text="Первый", author=SyndicationFeedTests.author)
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        since = http_date(time.time())
+        Post.objects.create(text="Второй", author=SyndicationFeedTests.author)
+        again = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(again.status_code, 200)
+        self.assertIn("Второй", self.titles(url))
+
+    def test_missing_object(self):
+        """Лента несуществующей группы или автора отдает 404"""
+        for url in (reverse("group_rss", kwargs={"slug": "missing"}),
+                    reverse("profile_rss", kwargs={"username": "missing"})):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
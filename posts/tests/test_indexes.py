@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.feed import follow_feed
+from posts.models import Comment, Follow, Group, Post, User
+
+TABLES = ("posts_post", "posts_comment", "posts_follow", "posts_feedentry")
+
+
+def query_plan(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """
+    Шаги плана, которые читают таблицу целиком, а не по индексу.
+    """
+    return [step for step in plan
+            if step.startswith(("SCAN TABLE", "SCAN "))
+            and "USING" not in step
+            and step.split()[-1] in TABLES]
+
+
+class FeedIndexesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="index_author")
+        cls.reader = User.objects.create_user(username="index_reader")
+        cls.group = Group.objects.create(title="Индексы", slug="indexes",
+                                         description="Группа")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text="Пост", author=cls.author,
+                                       group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text="Комментарий")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы страниц не читают таблицы постов целиком"""
+        author = FeedIndexesTests.author
+        urls = [
+            reverse("index"),
+            reverse("group_posts",
+                    kwargs={"slug": FeedIndexesTests.group.slug}),
+            reverse("profile", kwargs={"username": author.username}),
+            reverse("post", kwargs={"username": author.username,
+                                    "post_id": FeedIndexesTests.post.pk}),
+            reverse("follow_index"),
+        ]
+        client = Client()
+        client.force_login(FeedIndexesTests.reader)
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            for query in queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                with self.subTest(url=url, sql=query["sql"]):
+                    self.assertEqual(full_scans(query_plan(query["sql"])), [])
+
+    def test_sorted_feeds_do_not_sort_in_memory(self):
+        """Ленты группы, автора и подписок читаются в порядке индекса"""
+        querysets = [
+            FeedIndexesTests.group.posts.for_feed(),
+            FeedIndexesTests.author.posts.for_feed(),
+            follow_feed(FeedIndexesTests.reader).for_feed(),
+        ]
+        for queryset in querysets:
+            sql, params = queryset[:10].query.sql_with_params()
+            with self.subTest(sql=sql):
+                plan = query_plan(sql, params)
+                self.assertFalse(
+                    [step for step in plan if "TEMP B-TREE" in step], plan
+                )
+
+    def test_follow_is_unique(self):
+        """Нельзя подписаться на автора дважды"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=FeedIndexesTests.reader,
+                                  author=FeedIndexesTests.author)
@@ -0,0 +1,42 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.instrumentation import QueryBudgetExceeded
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="metrics_author")
+        Post.objects.bulk_create(
+            Post(text=f"Пост {i}", author=cls.author) for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Ответ содержит метрики запроса в заголовке Server-Timing"""
+        response = Client().get(reverse("index"))
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "cache;desc=", "total;dur="):
+            self.assertIn(metric, timing)
+        self.assertIn('desc="2 queries"', timing)
+
+    @override_settings(QUERY_BUDGETS={"posts.views.index": 1})
+    def test_query_budget_exceeded(self):
+        """Превышение бюджета запросов роняет тест"""
+        with self.assertRaises(QueryBudgetExceeded):
+            Client().get(reverse("index"))
+
+    @override_settings(QUERY_BUDGETS={"posts.views.index": 1},
+                       QUERY_BUDGET_ENFORCE=False)
+    def test_query_budget_logged(self):
+        """Без QUERY_BUDGET_ENFORCE превышение бюджета пишется в лог"""
+        with self.assertLogs("yatube.requests", "WARNING") as logs:
+            response = Client().get(reverse("index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("posts.views.index", logs.output[0])
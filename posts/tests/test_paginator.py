@@ -0,0 +1,249 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection, transaction
+from django.template.loader import render_to_string
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.paginator import CursorPaginator, decode_cursor, page_window
+from posts.tests.test_indexes import query_plan
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="cursor_author")
+        for i in range(25):
+            Post.objects.create(text=f"Пост {i}", author=cls.author)
+        cls.expected = list(
+            Post.objects.order_by("-pub_date", "-pk")
+            .values_list("pk", flat=True)
+        )
+
+    def test_walk_forward_and_back(self):
+        """Курсоры next/prev обходят ленту без пропусков и повторов"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        seen = [post.pk for page in pages for post in page]
+        self.assertEqual(seen, CursorPaginatorTests.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in pages[1]])
+        self.assertTrue(back.has_next())
+        self.assertTrue(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдает первую страницу"""
+        for cursor in ("", "garbage", "bnVsbA"):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                page = CursorPaginator(Post.objects.all(), 10).get_page(
+                    cursor
+                )
+                self.assertEqual(page[0].pk, CursorPaginatorTests.expected[0])
+
+    def test_cursor_seeks_into_index(self):
+        """Страница по курсору начинает чтение индекса с курсора"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.get_page(None).next_cursor
+        backward = paginator._ordered(forward=False).filter(
+            paginator._beyond(False, *decode_cursor(cursor)[1:])
+        )
+        for queryset in (paginator.after(cursor)[:11], backward[:11]):
+            plan = query_plan(*queryset.query.sql_with_params())
+            with self.subTest(plan=plan):
+                self.assertTrue(
+                    [step for step in plan if step.startswith("SEARCH")
+                     and "(pub_date" in step], plan
+                )
+
+    @override_settings(FEED_PAGINATION="cursor")
+    def test_feed_views_use_cursor_mode(self):
+        """Ленты отдают страницы по курсору в режиме cursor"""
+        client = Client()
+        response = client.get(reverse("profile", kwargs={
+            "username": CursorPaginatorTests.author.username
+        }))
+        page = response.context["page"]
+        self.assertIsInstance(page.paginator, CursorPaginator)
+        self.assertContains(response, f"?cursor={page.next_cursor}")
+
+        response = client.get(reverse("index"),
+                              {"cursor": page.next_cursor})
+        self.assertEqual(response.context["page"][0].pk,
+                         CursorPaginatorTests.expected[10])
+
+
+class FeedCountTests(TransactionTestCase):
+    # Числа постов поправляются после коммита, поэтому тестам нужны
+    # настоящие транзакции.
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author = User.objects.create_user(username="count_author")
+        self.group = Group.objects.create(title="Счетчики", slug="counts",
+                                          description="Группа")
+        for i in range(25):
+            Post.objects.create(text=f"Пост {i}", author=self.author,
+                                group=self.group)
+
+    def paginator(self, url):
+        return self.client.get(url).context["paginator"]
+
+    def test_counts_are_cached_and_maintained(self):
+        """Число постов берется из кэша и меняется вместе с постами"""
+        group_url = reverse("group_posts",
+                            kwargs={"slug": self.group.slug})
+        self.assertEqual(self.paginator(reverse("index")).count, 25)
+        self.assertEqual(self.paginator(group_url).count, 25)
+
+        post = Post.objects.create(text="Новый", author=self.author,
+                                   group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.paginator(reverse("index")).count, 26)
+        self.assertFalse(
+            [q for q in queries if "COUNT(" in q["sql"].upper()]
+        )
+        self.assertEqual(self.paginator(group_url).count, 26)
+
+        post.group = None
+        post.save()
+        self.assertEqual(self.paginator(group_url).count, 25)
+        post.delete()
+        self.assertEqual(self.paginator(reverse("index")).count, 25)
+
+    def test_rolled_back_post_is_not_counted(self):
+        """Откаченное создание поста не меняет число постов"""
+        self.assertEqual(self.paginator(reverse("index")).count, 25)
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                Post.objects.create(text="Откаченный", author=self.author)
+                raise DatabaseError
+        self.assertEqual(self.paginator(reverse("index")).count, 25)
+
+    def test_approximate_pages_hide_page_numbers(self):
+        """При приблизительном числе постов номера страниц не выводятся"""
+        response = self.client.get(reverse("index"), {"page": 2})
+        self.assertContains(response, "page=1")
+        self.assertContains(response, "page=3")
+        self.assertNotContains(response, ">3</a>")
+
+        profile = self.client.get(
+            reverse("profile",
+                    kwargs={"username": self.author.username})
+        )
+        self.assertFalse(profile.context["page"].paginator.approximate)
+        self.assertContains(profile, ">3</a>")
+
+    def test_known_count_is_not_copied(self):
+        """Срез запроса с известным числом считается по-настоящему"""
+        posts = Post.objects.with_count(1000)
+        self.assertEqual(posts.count(), 1000)
+        self.assertEqual(posts.filter(text="Пост 1").count(), 1)
+
+
+class PageWindowTests(TestCase):
+    def test_page_window(self):
+        """Окно страниц: края, соседи текущей и пропуски"""
+        self.assertEqual(page_window(3, 7), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(page_window(1, 12), [1, 2, 3, None, 12])
+        self.assertEqual(page_window(6, 12),
+                         [1, None, 4, 5, 6, 7, 8, None, 12])
+        self.assertEqual(page_window(12, 12), [1, None, 10, 11, 12])
+
+    def test_html_size_does_not_grow_with_pages(self):
+        """Размер разметки пагинатора не зависит от числа страниц"""
+        sizes = []
+        for num_pages in (20, 200000):
+            page = Paginator(range(num_pages * 10), 10).get_page(10)
+            sizes.append(len(render_to_string("posts/paginator.html",
+                                              {"page": page})))
+        self.assertLess(sizes[1] - sizes[0], 20)
+
+
+@override_settings(COMMENTS_PER_PAGE=10)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="comment_author")
+        cls.post = Post.objects.create(text="Пост", author=cls.author)
+        for i in range(25):
+            cls.post.comments.create(text=f"Комментарий {i}",
+                                     author=cls.author)
+        cls.expected = list(
+            cls.post.comments.order_by("created", "pk")
+            .values_list("pk", flat=True)
+        )
+        cls.kwargs = {"username": cls.author.username,
+                      "post_id": cls.post.pk}
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_shows_first_comments(self):
+        """Страница поста показывает только первые комментарии"""
+        response = self.client.get(reverse("post", kwargs=self.kwargs))
+        comments = response.context["comments_page"]
+        self.assertEqual([comment.pk for comment in comments],
+                         CommentPagesTests.expected[:10])
+        self.assertContains(response, "data-more-comments")
+        self.assertIsInstance(comments.object_list, list)
+        self.assertEqual(
+            [comment.pk for comment in response.context["comments"]],
+            CommentPagesTests.expected[:10],
+        )
+
+    def test_load_more_walks_all_comments(self):
+        """Кнопка "Показать еще" по курсору обходит все комментарии"""
+        url = reverse("post_comments", kwargs=self.kwargs)
+        seen = []
+        cursor = self.client.get(
+            reverse("post", kwargs=self.kwargs)
+        ).context["comments_page"].next_cursor
+        while cursor:
+            response = self.client.get(url, {"cursor": cursor})
+            comments = response.context["comments_page"]
+            seen.extend(comment.pk for comment in comments)
+            cursor = comments.next_cursor if comments.has_next() else None
+        self.assertEqual(seen, CommentPagesTests.expected[10:])
+        self.assertNotContains(response, "data-more-comments")
+
+    def test_load_more_json(self):
+        """С format=json комментарии отдаются в JSON"""
+        response = self.client.get(
+            reverse("post_comments", kwargs=self.kwargs), {"format": "json"}
+        )
+        data = response.json()
+        self.assertEqual([comment["id"] for comment in data["comments"]],
+                         CommentPagesTests.expected[:10])
+        self.assertEqual(data["comments"][0]["author"],
+                         CommentPagesTests.author.username)
+        self.assertTrue(data["next_cursor"])
+
+    def test_post_queries_do_not_grow_with_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев"""
+        url = reverse("post", kwargs=self.kwargs)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for i in range(30):
+            commenter = User.objects.create_user(username=f"commenter{i}")
+            CommentPagesTests.post.comments.create(text="Еще",
+                                                   author=commenter)
+        cache.clear()
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(after), len(before))
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from posts import views
+from posts.models import Post, User
+from yatube.routers import (
+    ReplicaMiddleware, reading_from_replica, sync_replica,
+)
+
+
+@override_settings(REPLICA_DATABASE="default")
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="replica_author")
+
+    def setUp(self):
+        self.session = SessionStore()
+
+    def request(self, view, method="get", write=False):
+        """
+        Проводит запрос через ReplicaMiddleware, как обработчик Django,
+        и возвращает, читало ли представление с реплики.
+        """
+        seen = {}
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            seen["replica"] = reading_from_replica()
+            if write:
+                Post.objects.create(text="Пост",
+                                    author=ReplicaRoutingTests.author)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        request = getattr(RequestFactory(), method)("/")
+        request.session = self.session
+        middleware(request)
+        self.assertFalse(reading_from_replica())
+        return seen["replica"]
+
+    def test_feed_reads_go_to_replica(self):
+        """Ленты на GET читаются с реплики, остальное - с основной базы"""
+        self.assertTrue(self.request(views.index))
+        self.assertTrue(self.request(views.follow_index))
+        self.assertFalse(self.request(views.new_post))
+        self.assertFalse(self.request(views.index, method="post"))
+
+    def test_read_your_writes(self):
+        """После записи сессия читает с основной базы"""
+        self.request(views.new_post, method="post", write=True)
+        self.assertFalse(self.request(views.index))
+
+        self.session[ReplicaMiddleware.session_key] = 0
+        self.assertTrue(self.request(views.index))
+
+    @override_settings(REPLICA_DATABASE="replica")
+    def test_replica_not_configured(self):
+        """Без настроенной реплики все читается с основной базы"""
+        self.assertFalse(self.request(views.index))
+
+
+@override_settings(REPLICA_DATABASE="default")
+class ReplicaCachingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="replica_cache")
+        cls.post = Post.objects.create(text="Старый текст", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_replica_pages_not_cached(self):
+        """Страницы с реплики не кэшируются и не получают ETag"""
+        urls = [reverse("index"), reverse("index_rss"),
+                reverse("profile", kwargs={
+                    "username": ReplicaCachingTests.author.username
+                })]
+        for url in urls:
+            with self.subTest(url=url):
+                Post.objects.filter(pk=ReplicaCachingTests.post.pk).update(
+                    text="Старый текст"
+                )
+                response = self.client.get(url)
+                self.assertNotIn("ETag", response)
+                # Правка в обход сигналов не меняет версию ленты.
+                Post.objects.filter(pk=ReplicaCachingTests.post.pk).update(
+                    text="Новый текст"
+                )
+                self.assertContains(self.client.get(url), "Новый текст")
+
+    @override_settings(REPLICA_DATABASE="replica")
+    def test_primary_pages_cached(self):
+        """Без реплики страница кэшируется и получает ETag"""
+        response = self.client.get(reverse("index"))
+        self.assertIn("ETag", response)
+        Post.objects.filter(pk=ReplicaCachingTests.post.pk).update(
+            text="Новый текст"
+        )
+        self.assertNotContains(self.client.get(reverse("index")),
+                               "Новый текст")
+
+
+class SyncReplicaTests(TransactionTestCase):
+    # backup API ждет, пока основная база занята открытой транзакцией,
+    # поэтому тест идет без обертки TestCase.
+    def test_sync_copies_primary(self):
+        """sync_replica копирует основную базу в файл реплики"""
+        author = User.objects.create_user(username="sync_author")
+        Post.objects.create(text="Пост", author=author)
+        with tempfile.TemporaryDirectory() as directory:
+            name = os.path.join(directory, "replica.sqlite3")
+            sync_replica(name)
+            replica = sqlite3.connect(name)
+            try:
+                count, = replica.execute(
+                    f"SELECT COUNT(*) FROM {Post._meta.db_table}"
+                ).fetchone()
+            finally:
+                replica.close()
+        self.assertEqual(count, Post.objects.count())
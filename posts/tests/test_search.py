@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from posts.search import SearchResults, match_expression
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="search_author")
+        cls.cats = Post.objects.create(text="Коты правят интернетом",
+                                       author=cls.author)
+        cls.dogs = Post.objects.create(text="Собаки охраняют дом",
+                                       author=cls.author)
+        Comment.objects.create(post=cls.dogs, author=cls.author,
+                               text="А у соседа живут коты")
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        return [post.pk for post in SearchResults(query)[:10]]
+
+    def test_match_expression_is_escaped(self):
+        """Строка поиска не может сломать синтаксис FTS5"""
+        self.assertEqual(match_expression('кот" OR NOT (dog'),
+                         '"кот" "OR" "NOT" "dog"*')
+        self.assertEqual(match_expression("  ** "), "")
+
+    def test_search_posts_and_comments(self):
+        """Ищутся и посты, и комментарии; пост по тексту выше"""
+        self.assertEqual(self.search("коты"),
+                         [SearchTests.cats.pk, SearchTests.dogs.pk])
+        self.assertEqual(self.search("охран"), [SearchTests.dogs.pk])
+        self.assertEqual(SearchResults("коты").count(), 2)
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_results_are_capped(self):
+        """Поиск читает не больше SEARCH_MAX_RESULTS документов"""
+        results = SearchResults("коты")
+        self.assertEqual(results.count(), 1)
+        self.assertEqual([post.pk for post in results[:10]],
+                         [SearchTests.cats.pk])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        post = SearchTests.cats
+        post.text = "Хомяки правят интернетом"
+        post.save()
+        self.assertEqual(self.search("хомяки"), [post.pk])
+        self.assertNotIn(post.pk, self.search("коты"))
+
+        SearchTests.dogs.comments.all().delete()
+        self.assertEqual(self.search("коты"), [])
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты"""
+        response = Client().get(reverse("search"), {"q": "собаки"})
+        self.assertEqual(list(response.context["page"]), [SearchTests.dogs])
+        self.assertContains(response, "Собаки охраняют дом")
+
+    def test_rebuild_command(self):
+        """Команда rebuild_search_index пересобирает индекс"""
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Проиндексировано документов: 3", out.getvalue())
+        self.assertEqual(self.search("соседа"), [SearchTests.dogs.pk])
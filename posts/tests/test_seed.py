@@ -0,0 +1,62 @@
+import shutil
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, User
+
+TEST_DIR = "test_data"
+
+
+@override_settings(MEDIA_ROOT=(TEST_DIR + "/media"))
+class SeedCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def seed(self, *args):
+        out = StringIO()
+        call_command("seed_yatube", "--users", 30, "--groups", 3,
+                     "--posts", 120, "--comments", 200, "--follows", 5,
+                     "--batch-size", 50, *args, stdout=out)
+        return out.getvalue()
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by("pk").values_list(
+                "text", "author__username", "group__slug", "image"
+            )),
+            list(Follow.objects.order_by("pk").values_list(
+                "user__username", "author__username"
+            )),
+        )
+
+    def test_sizes(self):
+        """Создается заданное число строк, счетчики согласованы"""
+        output = self.seed("--images", 2, "--image-ratio", 0.5)
+        self.assertIn("Готово", output)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Post.objects.exclude(image="").exists())
+        post = Post.objects.order_by("-comment_count").first()
+        self.assertEqual(post.comment_count, post.comments.count())
+
+    def test_deterministic(self):
+        """Одинаковый seed дает одинаковые данные"""
+        self.seed("--seed", 7)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed("--seed", 7)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_progress_by_batches(self):
+        """С -v 2 выводится прогресс по пачкам"""
+        output = self.seed("--verbosity", 2)
+        self.assertIn("posts: 50/120", output)
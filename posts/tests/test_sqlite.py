@@ -0,0 +1,26 @@
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+def pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+class SQLiteSettingsTests(TestCase):
+    def test_pragmas_applied(self):
+        """PRAGMA из настроек выполняются при открытии соединения"""
+        self.assertEqual(pragma("synchronous"), 1)
+        self.assertEqual(pragma("busy_timeout"), 5000)
+        self.assertEqual(pragma("cache_size"), -64000)
+
+
+class SQLiteTransactionTests(TransactionTestCase):
+    def test_transactions_are_immediate(self):
+        """Транзакция сразу берет блокировку на запись"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
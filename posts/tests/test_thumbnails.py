@@ -0,0 +1,262 @@
+import os
+import shutil
+
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails, uploads
+from posts.models import Post, User
+
+TEST_DIR = "test_data"
+
+
+def make_image(name="photo.png", size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name=name, content=buffer.getvalue(),
+                              content_type="image/png")
+
+
+@override_settings(MEDIA_ROOT=(TEST_DIR + "/media"))
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="photographer")
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_new_post_generates_thumbnail(self):
+        """Миниатюра создается при сохранении поста с картинкой"""
+        self.client.post(reverse("new_post"),
+                         {"text": "Фото", "image": make_image()})
+        post = Post.objects.get(text="Фото")
+        thumbnail = thumbnails.ready_thumbnail(post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, thumbnail.url)
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_webp_variants_in_srcset(self):
+        """WebP-варианты создаются не шире оригинала и попадают в srcset"""
+        self.client.post(reverse("new_post"),
+                         {"text": "Фото", "image": make_image()})
+        post = Post.objects.get(text="Фото")
+        variants = thumbnails.ready_variants(post.image)
+        self.assertEqual([width for width, _ in variants], [480, 960])
+        for width, thumbnail in variants:
+            with self.subTest(width=width):
+                self.assertTrue(thumbnail.name.endswith(".webp"))
+                self.assertEqual(thumbnail.width, width)
+
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f"{variants[0][1].url} 480w")
+
+    def run_on_commit(self):
+        """Выполняет отложенные до коммита действия, как при коммите."""
+        callbacks = [callback for _, callback in connection.run_on_commit]
+        connection.run_on_commit = []
+        for callback in callbacks:
+            callback()
+
+    @override_settings(THUMBNAIL_ASYNC=True)
+    def test_missing_thumbnail_falls_back_to_original(self):
+        """Пока миниатюры нет, в ленте показывается оригинал"""
+        post = Post.objects.create(text="Фото", author=self.author,
+                                   image=make_image("fallback.png"))
+        self.addCleanup(thumbnails.scheduled.discard, post.pk)
+        with patch.object(thumbnails.executor, "submit") as submit:
+            response = self.client.get(reverse("index"))
+            self.assertContains(response, post.image.url)
+            self.assertNotIn(post.pk, thumbnails.scheduled)
+            self.run_on_commit()
+        submit.assert_called_once_with(thumbnails.run_in_background,
+                                       post.pk)
+        self.assertIn(post.pk, thumbnails.scheduled)
+
+    @override_settings(THUMBNAIL_ASYNC=True)
+    def test_rolled_back_schedule_is_forgotten(self):
+        """После отката транзакции пост не остается в очереди"""
+        post = Post.objects.create(text="Фото", author=self.author,
+                                   image=make_image("rollback.png"))
+        with transaction.atomic():
+            thumbnails.schedule(post)
+            transaction.set_rollback(True)
+        with patch.object(thumbnails.executor, "submit") as submit:
+            self.run_on_commit()
+        submit.assert_not_called()
+        self.assertNotIn(post.pk, thumbnails.scheduled)
+
+
+@override_settings(MEDIA_ROOT=(TEST_DIR + "/media"), THUMBNAIL_ASYNC=False)
+class ThumbnailCleanupTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="cleaner")
+
+    def post_with_image(self, name):
+        post = Post.objects.create(text="Фото", author=self.author,
+                                   image=make_image(name))
+        thumbnails.generate(post.pk)
+        return post
+
+    def files(self, post):
+        source = post.image.name
+        return [source] + [thumbnail.name for thumbnail in
+                           thumbnails.stored_thumbnails(
+                               ImageFile(source, default_storage)
+                           )]
+
+    def assertDeleted(self, names):
+        for name in names:
+            with self.subTest(name=name):
+                self.assertFalse(default_storage.exists(name))
+
+    def test_edit_releases_old_image(self):
+        """Замена картинки удаляет старую вместе с миниатюрами"""
+        post = self.post_with_image("old.png")
+        old = self.files(post)
+        self.assertEqual(len(old), 4)
+        post.image = make_image("new.png")
+        post.save()
+        self.assertDeleted(old)
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    def test_cascade_delete_releases_images(self):
+        """Удаление автора удаляет картинки его постов"""
+        old = self.files(self.post_with_image("cascade.png"))
+        self.author.delete()
+        self.assertDeleted(old)
+
+    def test_shared_image_kept(self):
+        """Картинка, на которую ссылается другой пост, остается"""
+        post = self.post_with_image("shared.png")
+        Post.objects.create(text="Копия", author=self.author,
+                            image=post.image.name)
+        post.delete()
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    def test_command_removes_orphans(self):
+        """Команда удаляет картинки без постов и лишние миниатюры"""
+        kept = self.files(self.post_with_image("kept.png"))
+        orphan = default_storage.save("posts/orphan.png", make_image())
+        stray = default_storage.save("cache/ab/cd/stray.jpg",
+                                     ContentFile(b"x" * 2048))
+
+        out = StringIO()
+        call_command("cleanup_thumbnails", "--dry-run", "--min-age", 0,
+                     stdout=out)
+        self.assertIn("Можно освободить", out.getvalue())
+        self.assertTrue(default_storage.exists(orphan))
+
+        out = StringIO()
+        call_command("cleanup_thumbnails", "--min-age", 0, stdout=out)
+        self.assertIn("Картинки без постов: 1", out.getvalue())
+        self.assertIn("Миниатюры без записей: 1", out.getvalue())
+        self.assertDeleted([orphan, stray])
+        for name in kept:
+            with self.subTest(name=name):
+                self.assertTrue(default_storage.exists(name))
+
+    def test_command_keeps_fresh_uploads(self):
+        """Свежая картинка, пост для которой еще пишется, не удаляется"""
+        upload = default_storage.save("posts/fresh.png", make_image())
+        self.addCleanup(default_storage.delete, upload)
+        out = StringIO()
+        call_command("cleanup_thumbnails", stdout=out)
+        self.assertIn("Картинки без постов: 0", out.getvalue())
+        self.assertTrue(default_storage.exists(upload))
+
+
+def make_photo(name="photo.jpg", size=(300, 200), orientation=6):
+    """JPEG с EXIF: тег Orientation и геометка в комментарии."""
+    image = Image.new("RGB", size, "blue")
+    exif = image.getexif()
+    exif[0x0112] = orientation
+    exif[0x010E] = "GPS 55.75 37.62"
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", exif=exif.tobytes())
+    return SimpleUploadedFile(name=name, content=buffer.getvalue(),
+                              content_type="image/jpeg")
+
+
+@override_settings(MEDIA_ROOT=(TEST_DIR + "/media"), THUMBNAIL_ASYNC=False)
+class UploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="uploader")
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, image):
+        return self.client.post(reverse("new_post"),
+                                {"text": "Фото", "image": image})
+
+    def test_exif_stripped_and_orientation_applied(self):
+        """Картинка поворачивается по EXIF и сохраняется без метаданных"""
+        self.upload(make_photo())
+        post = Post.objects.get(text="Фото")
+        with default_storage.open(post.image.name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.size, (200, 300))
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertNotIn("exif", image.info)
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image))
+        # Временный файл заменил исходный и не остался рядом.
+        folder = os.path.dirname(post.image.name)
+        self.assertEqual(
+            [name for name in default_storage.listdir(folder)[1]
+             if name.endswith(".tmp")], []
+        )
+
+    def test_clean_image_kept(self):
+        """Картинка без метаданных не пересохраняется"""
+        self.upload(make_image())
+        post = Post.objects.get(text="Фото")
+        self.assertFalse(uploads.normalize(post))
+
+    @override_settings(UPLOAD_MAX_BYTES=1024)
+    def test_too_large_file_rejected(self):
+        """Файл больше UPLOAD_MAX_BYTES отклоняется формой"""
+        response = self.upload(make_image())
+        self.assertFormError(response, "form", "image", "Файл больше 0 МБ")
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(UPLOAD_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше UPLOAD_MAX_PIXELS отклоняется по заголовку"""
+        with patch("PIL.ImageFile.ImageFile.load") as load:
+            response = self.upload(make_image(size=(200, 100)))
+        self.assertFormError(response, "form", "image",
+                             "Картинка 200×100 больше 0 Мпикс")
+        load.assert_not_called()
+        self.assertFalse(Post.objects.exists())
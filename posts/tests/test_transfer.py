@@ -0,0 +1,145 @@
+import gzip
+import json
+import os
+import shutil
+
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.seed import seed
+
+TEST_DIR = "test_data"
+
+
+class TransferCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def setUp(self):
+        # Удаление пользователей поправляет закэшированные числа постов
+        # в лентах, они не должны достаться другим тестам.
+        self.addCleanup(cache.clear)
+        os.makedirs(TEST_DIR, exist_ok=True)
+        self.path = os.path.join(TEST_DIR, "yatube.ndjson.gz")
+
+    def snapshot(self):
+        return {
+            "users": list(User.objects.order_by("pk").values_list(
+                "pk", "username", "password"
+            )),
+            "groups": list(Group.objects.order_by("pk").values_list(
+                "pk", "slug"
+            )),
+            "posts": list(Post.objects.order_by("pk").values_list(
+                "pk", "text", "pub_date", "author_id", "group_id",
+                "comment_count"
+            )),
+            "comments": list(Comment.objects.order_by("pk").values_list(
+                "pk", "post_id", "author_id", "created"
+            )),
+            "follows": list(Follow.objects.order_by("pk").values_list(
+                "user_id", "author_id"
+            )),
+            "feed": FeedEntry.objects.count(),
+        }
+
+    def export(self, *args):
+        err = StringIO()
+        call_command("export_yatube", self.path, "--chunk-size", 7, *args,
+                     stderr=err)
+        return err.getvalue()
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка восстанавливают базу вместе с датами"""
+        seed(users=15, groups=2, posts=40, comments=60, follows=3,
+             batch_size=10)
+        before = self.snapshot()
+        report = self.export()
+        self.assertIn("post: 40", report)
+
+        for model in (User, Group):
+            model.objects.all().delete()
+        self.assertFalse(Post.objects.exists())
+
+        out = StringIO()
+        call_command("import_yatube", self.path, "--batch-size", 9,
+                     stdout=out)
+        self.assertIn("Загружено объектов", out.getvalue())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(User.objects.get(pk=before["users"][0][0])
+                         .stats.posts_count,
+                         Post.objects.filter(
+                             author_id=before["users"][0][0]).count())
+
+        # Повторная загрузка пропускает уже существующие объекты.
+        call_command("import_yatube", self.path, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_import_resets_feed_cache(self):
+        """После загрузки ленты не отдаются из старого кэша"""
+        author = User.objects.create_user(username="transfer_author")
+        Post.objects.create(text="Пост", author=author)
+        self.export()
+        Post.objects.all().delete()
+        url = reverse("index")
+        cached = self.client.get(url)
+        self.assertNotContains(cached, "Пост")
+
+        call_command("import_yatube", self.path, stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=cached["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Пост")
+        self.assertEqual(response.context["page"].paginator.count, 1)
+
+    def test_ndjson_format(self):
+        """По строке JSON на объект, модели по порядку зависимостей"""
+        author = User.objects.create_user(username="transfer_author")
+        Post.objects.create(text="Пост", author=author)
+        self.export()
+        with gzip.open(self.path, "rt", encoding="utf-8") as lines:
+            rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["model"] for row in rows], ["user", "post"])
+        self.assertEqual(rows[1]["text"], "Пост")
+        self.assertEqual(rows[1]["author_id"], author.pk)
+
+    def test_broken_line(self):
+        """Битая строка выгрузки дает понятную ошибку"""
+        path = os.path.join(TEST_DIR, "broken.ndjson")
+        with open(path, "w", encoding="utf-8") as out:
+            out.write('{"model": "group", "id": 1, "title": "Группа", '
+                      '"slug": "g", "description": ""}\n{"model": "cat"}\n')
+        with self.assertRaisesMessage(CommandError, "Строка 2"):
+            call_command("import_yatube", path, stdout=StringIO())
+
+    def test_conflicting_rows_rejected(self):
+        """Загрузка не отдает посты чужому пользователю с тем же pk"""
+        local = User.objects.create_user(username="local_user")
+        path = os.path.join(TEST_DIR, "conflict.ndjson")
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"model": "user", "id": local.pk,
+                                  "username": "remote_user",
+                                  "password": ""}) + "\n")
+            out.write(json.dumps({"model": "post", "id": 1, "text": "Чужой",
+                                  "pub_date": "2021-01-01T00:00:00+00:00",
+                                  "author_id": local.pk}) + "\n")
+        with self.assertRaisesMessage(CommandError, f"user: в базе уже есть "
+                                      f"другие объекты с теми же ключами, "
+                                      f"pk {local.pk}"):
+            call_command("import_yatube", path, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+        # Тот же username под другим pk - тоже конфликт.
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"model": "user", "id": local.pk + 1,
+                                  "username": "local_user",
+                                  "password": ""}) + "\n")
+        with self.assertRaisesMessage(CommandError, f"pk {local.pk + 1}"):
+            call_command("import_yatube", path, stdout=StringIO())
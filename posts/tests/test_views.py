@@ -1,11 +1,22 @@
 import shutil
+import time
+
+from unittest.mock import patch
 
 from django import forms
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
-from posts.models import Follow, Group, Post, User
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.test_thumbnails import make_image
+from yatube.settings import PER_PAGE
 
 TEST_DIR = "test_data"
 
@@ -58,6 +69,7 @@ class PostPagesTests(TestCase):
             pass
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username="test_user")
         self.authorized_client = Client()
@@ -207,17 +219,79 @@ class PostPagesTests(TestCase):
         self.assertEqual(response.context["page"].start_index(), 1)
         self.assertEqual(response.context["page"].end_index(), 10)
 
+    def test_feed_pages_pass_paginator(self):
+        """Ленты передают в контекст paginator страницы"""
+        urls = [
+            reverse("index"),
+            reverse("group_posts",
+                    kwargs={"slug": PostPagesTests.group.slug}),
+            reverse("profile",
+                    kwargs={"username": PostPagesTests.post.author.username}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                context = self.authorized_client.get(url).context
+                self.assertIs(context["paginator"], context["page"].paginator)
+
     def test_index_page_cache(self):
-        """Содержание страницы index сохраняется в кэше"""
+        """Содержание страницы index сохраняется в кэше до изменения ленты"""
         response = self.authorized_client.get(reverse("index"))
+        Post.objects.filter(pk=PostPagesTests.post.pk).update(
+            text="Изменено в обход сигналов"
+        )
+        response_cache = self.authorized_client.get(reverse("index"))
+        self.assertEqual(response.content, response_cache.content)
+
         Post.objects.create(
             text="Тест кэша",
             group=self.group,
             author=self.author,
         )
-        response_cache = self.authorized_client.get(reverse("index"))
-        self.assertIsNotNone(Post.objects.get(text="Тест кэша"))
-        self.assertEqual(response.content, response_cache.content)
+        response_new = self.authorized_client.get(reverse("index"))
+        self.assertContains(response_new, "Тест кэша")
+
+    def test_edited_post_is_not_served_from_cache(self):
+        """Отредактированный пост сразу виден на страницах лент"""
+        post = PostPagesTests.post
+        self.author_client.get(reverse("index"))
+        self.author_client.post(
+            reverse("post_edit", kwargs={"username": post.author.username,
+                                         "post_id": post.pk}),
+            {"text": "Новый текст поста", "group": post.group.pk},
+        )
+        for url in (reverse("index"),
+                    reverse("group_posts",
+                            kwargs={"slug": post.group.slug})):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertContains(response, "Новый текст поста")
+
+    def test_renamed_group_and_author_on_feed_pages(self):
+        """Новые название группы и имя автора сразу видны в лентах"""
+        post = PostPagesTests.post
+        self.guest_client.get(reverse("index"))
+        group = Group.objects.get(pk=post.group_id)
+        group.title = "Переименованная группа"
+        group.save()
+        author = User.objects.get(pk=post.author_id)
+        author.username = "renamed_author"
+        author.save()
+
+        for url in (reverse("index"),
+                    reverse("group_posts", kwargs={"slug": group.slug}),
+                    reverse("profile", kwargs={"username": "renamed_author"})):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, "#Переименованная группа")
+                self.assertContains(response, "@renamed_author")
+
+    def test_login_does_not_bump_feeds(self):
+        """Вход пользователя не сбрасывает кэш лент"""
+        response = self.guest_client.get(reverse("index"))
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=["last_login"])
+        self.assertEqual(self.guest_client.get(reverse("index"))["ETag"],
+                         response["ETag"])
 
     def test_follow_authorized_user(self):
         """Авторизированный пользователь может подписываться на других
@@ -263,3 +337,255 @@ class PostPagesTests(TestCase):
         )
         self.assertEqual(response_following_author.context["page"][0], post)
         self.assertNotIn(post, response_not_following_author.context["page"])
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="query_author")
+        cls.reader = User.objects.create_user(username="query_reader")
+        cls.group = Group.objects.create(
+            title="Группа запросов",
+            slug="queries",
+            description="Группа для подсчета запросов"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(FeedQueriesTests.reader)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    def create_posts(self, count, images=False):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f"Пост {i}",
+                group=FeedQueriesTests.group,
+                author=FeedQueriesTests.author,
+                image=make_image(f"feed_{i}.png") if images else None,
+            )
+            Comment.objects.create(post=post, text="Комментарий",
+                                   author=FeedQueriesTests.reader)
+            if images:
+                thumbnails.generate(post.pk)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def feed_urls(self):
+        return [
+            reverse("index"),
+            reverse("group_posts",
+                    kwargs={"slug": FeedQueriesTests.group.slug}),
+            reverse("profile",
+                    kwargs={"username": FeedQueriesTests.author.username}),
+            reverse("follow_index"),
+        ]
+
+    def test_feed_query_count_independent_of_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        urls = self.feed_urls()
+        self.create_posts(1)
+        single = {url: self.count_queries(url) for url in urls}
+        self.create_posts(PER_PAGE)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+    @override_settings(MEDIA_ROOT=(TEST_DIR + "/media"))
+    def test_feed_query_count_with_images(self):
+        """Миниатюры всех картинок страницы читаются одним запросом"""
+        urls = self.feed_urls()
+        self.create_posts(1, images=True)
+        single = {url: self.count_queries(url) for url in urls}
+        self.create_posts(PER_PAGE, images=True)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+    def test_post_item_shows_comment_count(self):
+        """Число комментариев берется из аннотации"""
+        self.create_posts(1)
+        response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["page"][0].comment_count, 1)
+        self.assertContains(response, "Комментариев: 1")
+
+
+class PostQueriesTests(TestCase):
+    """
+    Число запросов страниц поста и профиля: пост с автором, группой
+    и счетчиками читается одним запросом, подписка проверяется один раз.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="post_queries")
+        cls.reader = User.objects.create_user(username="post_reader")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text="Пост", author=cls.author)
+        for i in range(3):
+            Comment.objects.create(post=cls.post, text=f"Комментарий {i}",
+                                   author=cls.reader)
+        cls.kwargs = {"username": cls.author.username,
+                      "post_id": cls.post.pk}
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(PostQueriesTests.reader)
+
+    def assertQueries(self, count, request):
+        # Первый запрос прогревает кэш сессии и шаблонов.
+        request()
+        cache.clear()
+        with self.assertNumQueries(count):
+            request()
+
+    def test_post_view_queries(self):
+        """post_view: сессия, пользователь, автор для ETag, пост,
+        комментарии, подписка"""
+        url = reverse("post", kwargs=self.kwargs)
+        self.assertQueries(6, lambda: self.client.get(url))
+        self.assertQueries(3, lambda: Client().get(url))
+
+    def test_profile_queries(self):
+        """profile: сессия, пользователь, автор для ETag, автор,
+        подписка, посты"""
+        url = reverse("profile",
+                      kwargs={"username": PostQueriesTests.author.username})
+        self.assertQueries(6, lambda: self.client.get(url))
+
+    def test_add_comment_queries(self):
+        """add_comment после записи не читает комментарии и подписку"""
+        url = reverse("add_comment", kwargs=self.kwargs)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"text": "Новый"})
+        self.assertEqual(response.status_code, 302)
+        selects = [query["sql"] for query in queries
+                   if query["sql"].startswith("SELECT")]
+        self.assertFalse([sql for sql in selects
+                          if "posts_follow" in sql
+                          or 'FROM "posts_comment"' in sql])
+        self.assertQueries(5, lambda: self.client.get(url))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="etag_author")
+        cls.group = Group.objects.create(title="Группа", slug="etag",
+                                         description="Группа для ETag")
+        cls.post = Post.objects.create(text="Пост", author=cls.author,
+                                       group=cls.group)
+        cls.urls = [
+            reverse("index"),
+            reverse("group_posts", kwargs={"slug": cls.group.slug}),
+            reverse("profile", kwargs={"username": cls.author.username}),
+            reverse("post", kwargs={"username": cls.author.username,
+                                    "post_id": cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_page_returns_304(self):
+        """Неизменившаяся страница отдает 304 без шаблона"""
+        for url in ConditionalGetTests.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertFalse(again.templates)
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag ленты, профиля и поста"""
+        responses = {url: self.client.get(url)
+                     for url in ConditionalGetTests.urls}
+        Comment.objects.create(post=ConditionalGetTests.post, text="Новый",
+                               author=ConditionalGetTests.author)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response).status_code,
+                                 200)
+
+    def later(self, seconds=2):
+        """Часы conditional через seconds секунд после изменения."""
+        clock = patch("posts.conditional.time")
+        clock.start().time.return_value = time.time() + seconds
+        self.addCleanup(clock.stop)
+
+    def test_last_modified_after_change(self):
+        """После изменения ленты отдается Last-Modified"""
+        Comment.objects.create(post=ConditionalGetTests.post, text="Новый",
+                               author=ConditionalGetTests.author)
+        self.later()
+        for url in ConditionalGetTests.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                again = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                )
+                self.assertEqual(again.status_code, 304)
+
+    def test_change_in_same_second(self):
+        """Пост, созданный в ту же секунду, не дает 304 по дате"""
+        url = reverse("index")
+        Comment.objects.create(post=ConditionalGetTests.post, text="Новый",
+                               author=ConditionalGetTests.author)
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        since = http_date(time.time())
+        Post.objects.create(text="В ту же секунду",
+                            author=ConditionalGetTests.author)
+        again = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, "В ту же секунду")
+
+    def test_etag_depends_on_user_and_page(self):
+        """ETag зависит от пользователя и адреса страницы"""
+        url = ConditionalGetTests.urls[0]
+        anonymous = self.client.get(url)
+        self.assertNotEqual(self.client.get(url, {"page": 2})["ETag"],
+                            anonymous["ETag"])
+        self.client.force_login(ConditionalGetTests.author)
+        self.assertEqual(self.revalidate(url, anonymous).status_code, 200)
+
+    def test_no_last_modified_for_users(self):
+        """Last-Modified анонимной страницы не дает 304 после входа"""
+        Comment.objects.create(post=ConditionalGetTests.post, text="Новый",
+                               author=ConditionalGetTests.author)
+        url = ConditionalGetTests.urls[0]
+        self.later()
+        anonymous = self.client.get(url)
+        self.client.force_login(ConditionalGetTests.author)
+        again = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=anonymous["Last-Modified"]
+        )
+        self.assertEqual(again.status_code, 200)
+        self.assertNotIn("Last-Modified", again)
+
+    def test_missing_objects_return_404(self):
+        """Для несуществующих объектов по-прежнему 404"""
+        urls = [
+            reverse("group_posts", kwargs={"slug": "missing"}),
+            reverse("profile", kwargs={"username": "missing"}),
+            reverse("post", kwargs={"username": "missing", "post_id": 1}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
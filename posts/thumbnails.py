@@ -0,0 +1,300 @@
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import (
+    defaults as sorl_defaults, settings as sorl_settings,
+)
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .cache import bump_feeds, forget_post_item, post_feeds
+from .models import Post
+from .uploads import normalize
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = "960x339"
+FEED_OPTIONS = {"crop": "center", "upscale": True}
+
+# Варианты картинки для srcset: WebP разной ширины с пропорциями ленты.
+VARIANT_WIDTHS = (480, 960, 1440)
+VARIANT_OPTIONS = {"crop": "center", "upscale": True, "format": "WEBP",
+                   "quality": 80}
+
+executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS,
+                              thread_name_prefix="thumbnails")
+scheduled = set()
+scheduled_lock = threading.Lock()
+released = set()
+released_lock = threading.Lock()
+
+
+class Backend(ThumbnailBackend):
+    def thumbnail_name(self, file_, geometry_string, **options):
+        """
+        Имя файла миниатюры, как его вычисляет get_thumbnail, но без
+        обращения к хранилищу ключей sorl и без создания миниатюры.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+backend = Backend()
+
+
+def variant_geometry(width):
+    return f"{width}x{round(width * 339 / 960)}"
+
+
+def thumbnail_names(image):
+    """
+    Имена миниатюры для ленты и WebP-вариантов: (имя, [(ширина, имя)]).
+    """
+    return (
+        backend.thumbnail_name(image, FEED_GEOMETRY, **FEED_OPTIONS),
+        [(width, backend.thumbnail_name(image, variant_geometry(width),
+                                        **VARIANT_OPTIONS))
+         for width in VARIANT_WIDTHS],
+    )
+
+
+def stored_images(names):
+    """
+    Записи хранилища ключей sorl для файлов names: {имя: ImageFile или
+    None}. sorl читает каждую запись отдельно, из кэша, а при промахе
+    запросом к базе. Здесь кэш читается одним get_many, а промахи
+    одним запросом, и найденное (и отсутствие записи) кэшируется так же,
+    как это делает sorl.
+    """
+    kvstore = default.kvstore
+    files = {name: ImageFile(name, default.storage) for name in names}
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {name: kvstore.get(file) for name, file in files.items()}
+    keys = {add_prefix(file.key): name for name, file in files.items()}
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(key__in=missing)
+                     .values_list("key", "value"))
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        name: (None if not values[key] or values[key] == EMPTY_VALUE
+               else deserialize_image_file(values[key]))
+        for key, name in keys.items()
+    }
+
+
+def ready_images(images):
+    """
+    Готовые миниатюры и WebP-варианты сразу для нескольких картинок:
+    {имя картинки: (миниатюра или None, [(ширина, вариант), ...])}.
+    Ничего не создает, отсутствующих миниатюр просто нет в ответе.
+    """
+    names = {image.name: thumbnail_names(image) for image in images}
+    stored = stored_images([
+        name for thumbnail, variants in names.values()
+        for name in [thumbnail] + [variant for _, variant in variants]
+    ])
+    return {
+        image: (stored[thumbnail],
+                [(width, stored[variant]) for width, variant in variants
+                 if stored[variant] is not None])
+        for image, (thumbnail, variants) in names.items()
+    }
+
+
+def ready_thumbnail(image):
+    """
+    Готовая миниатюра для ленты или None, если ее еще нет.
+    """
+    return ready_images([image])[image.name][0]
+
+
+def ready_variants(image):
+    """
+    Готовые WebP-варианты картинки: список пар (ширина, миниатюра).
+    """
+    return ready_images([image])[image.name][1]
+
+
+def generate_variants(image):
+    """
+    Создает WebP-варианты не шире оригинала (самый узкий создается
+    всегда), чтобы не раздувать маленькие картинки.
+    """
+    source = default.kvstore.get_or_set(ImageFile(image))
+    for width in VARIANT_WIDTHS:
+        if width > VARIANT_WIDTHS[0] and width > source.width:
+            break
+        backend.get_thumbnail(image, variant_geometry(width),
+                              **VARIANT_OPTIONS)
+
+
+def generate(post_id):
+    """
+    Приводит картинку к нормальному виду (см. uploads.normalize),
+    создает миниатюру и варианты для ленты и сбрасывает закэшированные
+    фрагменты с картинкой-заглушкой. Время шагов пишется в лог.
+    """
+    try:
+        post = Post.objects.for_feed().filter(pk=post_id).first()
+        if post is not None and post.image:
+            start = time.monotonic()
+            rewritten = normalize(post)
+            normalized = time.monotonic()
+            backend.get_thumbnail(post.image, FEED_GEOMETRY, **FEED_OPTIONS)
+            generate_variants(post.image)
+            done = time.monotonic()
+            forget_post_item(post)
+            bump_feeds(*post_feeds(post.author_id, post.group_id))
+            logger.info(
+                "Картинка поста %s: нормализация %.0f мс%s, "
+                "миниатюры %.0f мс", post_id,
+                (normalized - start) * 1000,
+                " (перезаписана)" if rewritten else "",
+                (done - normalized) * 1000,
+            )
+    except Exception:
+        logger.exception("Не удалось создать миниатюру для поста %s",
+                         post_id)
+    finally:
+        with scheduled_lock:
+            scheduled.discard(post_id)
+
+
+def run_in_background(post_id):
+    try:
+        generate(post_id)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """
+    Ставит создание миниатюры в очередь фоновых потоков после коммита
+    транзакции. С THUMBNAIL_ASYNC = False создает ее сразу. Пост
+    отмечается в scheduled только после коммита: при откате отметка
+    навсегда заблокировала бы его миниатюру.
+    """
+    if not settings.THUMBNAIL_ASYNC:
+        generate(post.pk)
+        return
+    post_id = post.pk
+
+    def submit():
+        with scheduled_lock:
+            if post_id in scheduled:
+                return
+            scheduled.add(post_id)
+        executor.submit(run_in_background, post_id)
+
+    transaction.on_commit(submit)
+
+
+def file_size(name):
+    try:
+        return default_storage.size(name)
+    except OSError:
+        return 0
+
+
+def stored_thumbnails(source):
+    """
+    Миниатюры картинки, записанные в хранилище ключей sorl. У sorl нет
+    для этого открытого API, его собственный cleanup читает так же.
+    """
+    kvstore = default.kvstore
+    keys = kvstore._get(source.key, identity="thumbnails") or []
+    return [thumbnail for thumbnail in map(kvstore._get, keys) if thumbnail]
+
+
+def release_images(names, dry_run=False):
+    """
+    Удаляет картинки names, на которые больше не ссылается ни один пост,
+    вместе с их миниатюрами и записями в хранилище ключей sorl.
+    Возвращает число удаленных файлов и освобожденные байты.
+    """
+    names = set(filter(None, names))
+    names -= set(Post.objects.filter(image__in=names)
+                 .values_list("image", flat=True))
+    files = freed = 0
+    for name in names:
+        try:
+            default_storage.path(name)
+        except SuspiciousFileOperation:
+            # Путь вне MEDIA_ROOT: такой файл не наш.
+            continue
+        except NotImplementedError:
+            # У удаленных хранилищ нет локальных путей.
+            pass
+        source = ImageFile(name, default_storage)
+        thumbnails = stored_thumbnails(source)
+        files += len(thumbnails)
+        freed += sum(file_size(thumbnail.name) for thumbnail in thumbnails)
+        if default_storage.exists(name):
+            files += 1
+            freed += file_size(name)
+        if not dry_run:
+            default.kvstore.delete(source)
+            default_storage.delete(name)
+    return files, freed
+
+
+def release_quietly(names):
+    # Ошибка при уборке файлов не должна ломать сохранение поста.
+    try:
+        release_images(names)
+    except Exception:
+        logger.exception("Не удалось удалить картинки %s", names)
+
+
+def run_release():
+    with released_lock:
+        names = list(released)
+        released.clear()
+    try:
+        if names:
+            release_quietly(names)
+    finally:
+        connection.close()
+
+
+def release_later(name):
+    """
+    Удаляет картинку отредактированного или удаленного поста после
+    коммита транзакции. Картинки копятся в общем наборе, поэтому
+    удаление тысячи постов (например, каскадом вместе с автором)
+    проверяет ссылки на них одним запросом.
+    """
+    if not name:
+        return
+    if not settings.THUMBNAIL_ASYNC:
+        release_quietly([name])
+        return
+    with released_lock:
+        released.add(name)
+    # Лишние вызовы после первого находят набор пустым.
+    transaction.on_commit(lambda: executor.submit(run_release))
@@ -0,0 +1,220 @@
+import json
+import time
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, reset_queries, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+from .seed import rebuild_derived
+
+# Модели в порядке зависимостей: при загрузке строки, на которые
+# ссылаются внешние ключи, уже записаны.
+MODELS = {
+    "user": (User, ["id", "username", "password", "email", "first_name",
+                    "last_name", "is_active", "is_staff", "is_superuser",
+                    "date_joined", "last_login"]),
+    "group": (Group, ["id", "title", "slug", "description"]),
+    "post": (Post, ["id", "text", "pub_date", "author_id", "group_id",
+                    "image", "comment_count"]),
+    "comment": (Comment, ["id", "post_id", "author_id", "text", "created"]),
+    "follow": (Follow, ["id", "user_id", "author_id"]),
+}
+
+
+# Поля, по которым объект выгрузки узнается в базе. Строка с тем же pk,
+# но другими значениями этих полей - чужой объект, а не загруженный
+# раньше: пропустить ее значило бы отдать посты чужому пользователю.
+IDENTITY = {
+    "user": ["username"],
+    "group": ["slug"],
+    "post": ["author_id", "pub_date"],
+    "comment": ["post_id", "author_id", "created"],
+    "follow": ["user_id", "author_id"],
+}
+
+# Уникальные поля, совпадение которых при другом pk тоже конфликт.
+UNIQUE = {"user": "username", "group": "slug"}
+
+
+class TransferError(Exception):
+    pass
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """
+    Даты с микросекундами: DjangoJSONEncoder округляет их
+    до миллисекунд, и порядок постов с близкими датами терялся бы.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def date_fields(model):
+    return {field.attname for field in model._meta.concrete_fields
+            if isinstance(field, models.DateTimeField)}
+
+
+def report(log, name, done, start):
+    elapsed = time.monotonic() - start
+    log(f"{name}: {done} за {elapsed:.1f} с "
+        f"({done / max(elapsed, 1e-6):.0f} в с)")
+
+
+def export_rows(out, chunk_size=5000, log=None, progress=None):
+    """
+    Пишет в out по строке JSON на объект. Строки читаются из базы
+    через values() и iterator(chunk_size), так что память не зависит
+    от размера базы. Файлы картинок не копируются, только их имена.
+    """
+    log = log or (lambda message: None)
+    progress = progress or (lambda message: None)
+    encoder = ExportEncoder(ensure_ascii=False)
+    total = 0
+    for name, (model, fields) in MODELS.items():
+        start = time.monotonic()
+        rows = model.objects.order_by("pk").values(*fields)
+        lines, done = [], 0
+        for row in rows.iterator(chunk_size=chunk_size):
+            lines.append(encoder.encode({"model": name, **row}))
+            done += 1
+            if len(lines) == chunk_size:
+                out.write("\n".join(lines) + "\n")
+                lines = []
+                progress(f"{name}: {done}")
+        if lines:
+            out.write("\n".join(lines) + "\n")
+        report(log, name, done, start)
+        total += done
+    return total
+
+
+@contextmanager
+def keep_dates():
+    """
+    Отключает auto_now_add, иначе bulk_create заменит даты
+    из выгрузки текущим временем.
+    """
+    fields = [field for model, _ in MODELS.values()
+              for field in model._meta.concrete_fields
+              if getattr(field, "auto_now_add", False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def parse_rows(lines):
+    """
+    Разбирает выгрузку построчно: (имя модели, объект).
+    """
+    dates = {name: date_fields(model)
+             for name, (model, _) in MODELS.items()}
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            name = row.pop("model")
+            model, _ = MODELS[name]
+            for field in dates[name]:
+                if row.get(field) is not None:
+                    row[field] = parse_datetime(row[field])
+            yield name, model(**row)
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            raise TransferError(f"Строка {number}: {error!r}")
+
+
+def check_conflicts(name, batch):
+    """
+    Выбрасывает TransferError, если pk или уникальные поля объектов
+    пачки в базе уже заняты другими объектами.
+    """
+    model, _ = MODELS[name]
+    fields = IDENTITY[name]
+    incoming = {obj.pk: tuple(getattr(obj, field) for field in fields)
+                for obj in batch}
+    found = {
+        pk for pk, *values in model.objects.filter(pk__in=incoming)
+        .values_list("pk", *fields)
+        if tuple(values) != incoming[pk]
+    }
+    unique = UNIQUE.get(name)
+    if unique:
+        owners = {getattr(obj, unique): obj.pk for obj in batch}
+        found.update(
+            owners[value] for pk, value in
+            model.objects.filter(**{f"{unique}__in": owners})
+            .values_list("pk", unique)
+            if owners[value] != pk
+        )
+    if found:
+        raise TransferError(
+            f"{name}: в базе уже есть другие объекты с теми же ключами, "
+            f"pk {', '.join(map(str, sorted(found)[:10]))}"
+        )
+
+
+def import_rows(lines, batch_size=5000, log=None, progress=None):
+    """
+    Загружает выгрузку export_rows пачками bulk_create по batch_size
+    строк, каждая пачка в своей транзакции. Объекты, которые уже есть
+    в базе, пропускаются, так что прерванную загрузку можно повторить.
+    Если pk или уникальное поле занято другим объектом, загрузка
+    останавливается с TransferError.
+    Сигналы при bulk_create не срабатывают, поэтому в конце ленты,
+    счетчики и индекс пересобираются заново.
+    """
+    log = log or (lambda message: None)
+    progress = progress or (lambda message: None)
+    counts = {}
+    batch, current, start = [], None, time.monotonic()
+
+    def flush():
+        if not batch:
+            return
+        model, _ = MODELS[current]
+        with transaction.atomic():
+            check_conflicts(current, batch)
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        counts[current] = counts.get(current, 0) + len(batch)
+        progress(f"{current}: {counts[current]}")
+        batch.clear()
+        # При DEBUG каждый INSERT со всеми строками пачки остается
+        # в connection.queries, и память росла бы с размером выгрузки.
+        reset_queries()
+
+    with keep_dates():
+        for name, obj in parse_rows(lines):
+            if name != current:
+                flush()
+                if current is not None:
+                    report(log, current, counts[current], start)
+                current, start = name, time.monotonic()
+            batch.append(obj)
+            if len(batch) == batch_size:
+                flush()
+        flush()
+        if current is not None:
+            report(log, current, counts[current], start)
+
+    # Как loaddata: счетчики первичных ключей после явно заданных pk.
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for model, _ in MODELS.values()]
+    )
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    rebuild_derived(log)
+    return sum(counts.values())
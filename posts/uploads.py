@@ -0,0 +1,80 @@
+import os
+
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Форматы, которые пересохраняются без потерь кадров и прозрачности.
+NORMALIZED_FORMATS = {"JPEG": {"quality": 90}, "PNG": {}, "WEBP": {}}
+METADATA_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "comment")
+
+
+def megabytes(size):
+    return f"{size / 2 ** 20:.0f} МБ"
+
+
+def check_upload(upload):
+    """
+    Проверяет загруженную картинку по размеру файла и заголовку.
+    Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет кусками
+    во временный файл, а ImageField открывает его без декодирования,
+    так что в потоке запроса картинка целиком в память не читается.
+    """
+    if upload.size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            "Файл больше %(limit)s",
+            code="file_too_large",
+            params={"limit": megabytes(settings.UPLOAD_MAX_BYTES)},
+        )
+    image = getattr(upload, "image", None)
+    if image is None:
+        return
+    width, height = image.size
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            "Картинка %(width)s×%(height)s больше %(limit)s Мпикс",
+            code="too_many_pixels",
+            params={"width": width, "height": height,
+                    "limit": settings.UPLOAD_MAX_PIXELS // 10 ** 6},
+        )
+
+
+def has_metadata(image):
+    return (bool(image.getexif())
+            or any(key in image.info for key in METADATA_KEYS))
+
+
+def normalize(post):
+    """
+    Поворачивает картинку поста по тегу EXIF Orientation и пересохраняет
+    ее без метаданных (EXIF с геометкой, XMP, комментарии). Картинки без
+    метаданных, анимации и другие форматы не трогает. Вызывается
+    в фоновом потоке до создания миниатюр. Возвращает True, если файл
+    перезаписан.
+    """
+    field = post.image
+    with field.storage.open(field.name, "rb") as source:
+        image = Image.open(source)
+        options = NORMALIZED_FORMATS.get(image.format)
+        if (options is None or getattr(image, "is_animated", False)
+                or not has_metadata(image)):
+            return False
+        image_format = image.format
+        icc_profile = image.info.get("icc_profile")
+        image = ImageOps.exif_transpose(image)
+        buffer = BytesIO()
+        if icc_profile:
+            options = {**options, "icc_profile": icc_profile}
+        # Без явного exif= Pillow метаданные не записывает.
+        image.save(buffer, image_format, **options)
+
+    # Файл пишется под временным именем и заменяет исходный одним
+    # переименованием, так что картинка не пропадает ни на миг.
+    storage = field.storage
+    temporary = storage.save(f"{field.name}.tmp",
+                             ContentFile(buffer.getvalue()))
+    os.replace(storage.path(temporary), storage.path(field.name))
+    return True
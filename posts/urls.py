@@ -1,18 +1,29 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("follow/", views.follow_index, name="follow_index"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     path("new/", views.new_post, name="new_post"),
+    path("search/", views.search, name="search"),
+    path("rss/", feeds.IndexFeed(), name="index_rss"),
+    path("atom/", feeds.AtomIndexFeed(), name="index_atom"),
+    path("group/<slug:slug>/rss/", feeds.GroupFeed(), name="group_rss"),
+    path("group/<slug:slug>/atom/", feeds.AtomGroupFeed(),
+         name="group_atom"),
     path("<str:username>/", views.profile, name="profile"),
+    path("<str:username>/rss/", feeds.ProfileFeed(), name="profile_rss"),
+    path("<str:username>/atom/", feeds.AtomProfileFeed(),
+         name="profile_atom"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
     path("<str:username>/<int:post_id>/edit/",
          views.post_edit, name="post_edit"),
     path("<str:username>/<int:post_id>/comment/",
          views.add_comment, name="add_comment"),
+    path("<str:username>/<int:post_id>/comments/",
+         views.post_comments, name="post_comments"),
     path("<str:username>/follow/", views.profile_follow,
          name="profile_follow"),
     path("<str:username>/unfollow/", views.profile_unfollow,
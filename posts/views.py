@@ -1,38 +1,117 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.http import urlencode
 
 from yatube.settings import PER_PAGE
 
+from . import thumbnails
+from .cache import feed_count, feed_version
+from .conditional import conditional_feed
+from .counters import user_stats
+from .feed import follow_feed
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginator import CursorPaginator
+from .search import SearchResults
+
+
+def paginate(request, posts, count=None, exact=True):
+    """
+    Разбивает ленту на страницы: по номеру страницы или, если включен
+    режим FEED_PAGINATION = "cursor" или передан ?cursor=, по курсору.
+    Число постов count берется из счетчиков; если оно приблизительное
+    (exact=False), paginator.html не выводит номера всех страниц.
+    """
+    if settings.FEED_PAGINATION == "cursor" or "cursor" in request.GET:
+        paginator = CursorPaginator(posts, PER_PAGE)
+        return paginator.get_page(request.GET.get("cursor"))
+
+    if count is not None:
+        posts = posts.with_count(count)
+    paginator = Paginator(posts, PER_PAGE)
+    paginator.approximate = not exact
+    page_number = request.GET.get("page")
+    return paginator.get_page(page_number)
+
+
+def paginate_comments(post, cursor):
+    """
+    Страница комментариев поста по курсору, от старых к новым.
+    """
+    comments = post.comments.select_related("author")
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                date_field="created", descending=False)
+    return paginator.get_page(cursor)
+
+
+def index_feeds(request):
+    return ["index"]
+
 
+def group_feeds(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        "pk", flat=True
+    ).first()
+    return None if group_id is None else [f"group:{group_id}"]
 
+
+def profile_feeds(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        "pk", flat=True
+    ).first()
+    return None if author_id is None else [f"profile:{author_id}"]
+
+
+def post_feeds(request, username, post_id):
+    # Карточка автора на странице поста меняется вместе с его профилем.
+    author_id = Post.objects.filter(
+        pk=post_id, author__username=username
+    ).values_list("author_id", flat=True).first()
+    if author_id is None:
+        return None
+    return [f"post:{post_id}", f"profile:{author_id}"]
+
+
+@conditional_feed(index_feeds)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
 
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    page = paginate(request, posts, feed_count("index", posts), exact=False)
 
     return render(
         request,
         "posts/index.html",
-        {"page": page}
+        {"page": page, "paginator": page.paginator,
+         "feed_version": feed_version("index")}
     )
 
 
+@conditional_feed(group_feeds)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
+
+    page = paginate(request, posts, feed_count(f"group:{group.pk}", posts),
+                    exact=False)
+
+    return render(request, "posts/group.html", {
+        "group": group, "page": page, "paginator": page.paginator,
+        "feed_version": feed_version(f"group:{group.pk}"),
+    })
 
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
 
-    return render(request, "posts/group.html", {"group": group,
-                                                "page": page})
+def search(request):
+    query = request.GET.get("q", "").strip()
+    paginator = Paginator(SearchResults(query), PER_PAGE)
+    page = paginator.get_page(request.GET.get("page"))
+    return render(request, "posts/search.html", {
+        "query": query, "page": page, "paginator": paginator,
+        "params": urlencode({"q": query}),
+    })
 
 
 @login_required
@@ -46,58 +125,104 @@ def new_post(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            thumbnails.schedule(post)
         return redirect("index")
 
     return render(request, "posts/new.html",
                   {"new_post": new_post, "form": form})
 
 
-def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+def is_following(user, author):
+    """
+    Подписан ли user на author; для анонимного пользователя запроса нет.
+    """
+    if not user.is_authenticated:
+        return False
+    return Follow.objects.filter(author=author, user=user).exists()
 
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(author=author,
-                                          user=request.user).exists()
-        return render(request, "posts/profile.html", {
-            "author": author, "posts": posts,
-            "page": page, "following": following
-        })
-    return render(
-        request,
-        "posts/profile.html",
-        {"author": author, "posts": posts, "page": page}
+
+def get_post(username, post_id):
+    """
+    Пост вместе с автором, его счетчиками и группой одним запросом.
+    """
+    return get_object_or_404(
+        Post.objects.for_feed().select_related("author__stats"),
+        author__username=username, pk=post_id
     )
 
 
-def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username,
-                             pk=post_id)
-    comments = post.comments.all()
-    form = CommentForm()
-
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            author=User.objects.get(username=username),
-            user=request.user
-        ).exists()
-        return render(request, "posts/post.html",
-                      {"author": post.author,
-                       "posts": post.author.posts.all(),
-                       "post": post,
-                       "comments": comments,
-                       "form": form,
-                       "following": following})
-    return render(request, "posts/post.html", {
-        "author": post.author,
-        "posts": post.author.posts.all(),
+def post_context(request, post, comments_page, form):
+    """
+    Контекст страницы поста для post_view и add_comment. Число постов
+    автора для posts берется из счетчика, а не из COUNT(*). Шаблон
+    выводит уже прочитанную comments_page, а comments - QuerySet тех же
+    комментариев, который без обращения к нему не выполняется.
+    """
+    author = post.author
+    stats = user_stats(author)
+    return {
+        "author": author,
+        "stats": stats,
+        "posts": author.posts.with_count(stats.posts_count),
         "post": post,
-        "comments": comments,
+        "comments": post.comments.filter(
+            pk__in=[comment.pk for comment in comments_page]
+        ).select_related("author").order_by("created", "pk"),
+        "comments_page": comments_page,
+        "comments_url": reverse("post_comments", kwargs={
+            "username": author.username, "post_id": post.pk,
+        }),
         "form": form,
+        "following": is_following(request.user, author),
+    }
+
+
+@conditional_feed(profile_feeds)
+def profile(request, username):
+    author = get_object_or_404(User.objects.select_related("stats"),
+                               username=username)
+    stats = user_stats(author)
+    posts = author.posts.for_feed().with_count(stats.posts_count)
+
+    page = paginate(request, posts)
+    return render(request, "posts/profile.html", {
+        "author": author, "stats": stats, "posts": posts, "page": page,
+        "paginator": page.paginator,
+        "following": is_following(request.user, author),
+        "feed_version": feed_version(f"profile:{author.pk}"),
+    })
+
+
+@conditional_feed(post_feeds)
+def post_view(request, username, post_id):
+    post = get_post(username, post_id)
+    comments_page = paginate_comments(post, request.GET.get("comments"))
+    return render(request, "posts/post.html",
+                  post_context(request, post, comments_page, CommentForm()))
+
+
+def post_comments(request, username, post_id):
+    """
+    Следующая страница комментариев для кнопки "Показать еще":
+    HTML-фрагмент или, с ?format=json, JSON.
+    """
+    post = get_object_or_404(Post.objects.only("pk"),
+                             author__username=username, pk=post_id)
+    comments_page = paginate_comments(post, request.GET.get("cursor"))
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "comments": [{
+                "id": comment.pk,
+                "author": comment.author.username,
+                "text": comment.text,
+                "created": comment.created.isoformat(),
+            } for comment in comments_page],
+            "next_cursor": comments_page.next_cursor,
+        })
+    return render(request, "posts/comment_list.html", {
+        "comments_page": comments_page,
+        "comments_url": request.path,
     })
 
 
@@ -116,7 +241,9 @@ def post_edit(request, username, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if "image" in form.changed_data and post.image:
+            thumbnails.schedule(post)
         return redirect(url)
     return render(request, "posts/new.html", {"username": username,
                                               "post_id": post_id,
@@ -127,57 +254,35 @@ def post_edit(request, username, post_id):
 
 @login_required
 def add_comment(request, username, post_id):
-    url = reverse("post", kwargs={"username": username,
-                                  "post_id": post_id})
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    comments = post.comments.all()
-
-    form = CommentForm(
-        request.POST or None
-    )
-
-    following = Follow.objects.filter(
-        author=User.objects.get(username=username),
-        user=request.user
-    ).exists()
-
+    post = get_post(username, post_id)
+    form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
-        return redirect(url)
+        return redirect(reverse("post", kwargs={"username": username,
+                                                "post_id": post_id}))
 
-    return render(request, "posts/post.html", {
-        "author": post.author,
-        "posts": post.author.posts.all(),
-        "post": post,
-        "form": form,
-        "comments": comments,
-        "following": following
-    })
+    comments_page = paginate_comments(post, None)
+    return render(request, "posts/post.html",
+                  post_context(request, post, comments_page, form))
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = follow_feed(request.user).for_feed()
 
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    page = paginate(request, posts)
     return render(request, "posts/follow.html",
-                  {"page": page, "paginator": paginator})
+                  {"page": page, "paginator": page.paginator})
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        is_following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-        if not is_following:
-            Follow.objects.create(user=request.user, author=author)
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect(reverse("follow_index"))
 
 
@@ -0,0 +1,182 @@
+import json
+import logging
+import threading
+import time
+
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger("yatube.requests")
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rendering = False
+
+
+def current_metrics():
+    return getattr(_local, "metrics", None)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        # Вложенные отрисовки уже входят во время внешней.
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.rendering = False
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Бэкенд шаблонов Django, который засекает время отрисовки шаблонов
+    для RequestMetricsMiddleware.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name),
+                                 self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def instrument_cache(cache):
+    """
+    Оборачивает get и get_many кэша, чтобы считать попадания и промахи
+    текущего запроса.
+    """
+    if getattr(cache, "_instrumented", False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, default, version)
+        metrics = current_metrics()
+        if metrics is not None:
+            if value is default:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return value
+
+    def counted_get_many(keys, version=None):
+        values = get_many(keys, version)
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    cache.get, cache.get_many = counted_get, counted_get_many
+    cache._instrumented = True
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_time += time.perf_counter() - start
+
+
+def func_path(func):
+    # У экземпляров классов-представлений (например, лент
+    # django.contrib.syndication) нет __name__, берется имя класса.
+    name = getattr(func, "__name__", type(func).__name__)
+    return f"{func.__module__}.{name}"
+
+
+def view_path(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    return func_path(match.func)
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает для каждого запроса число SQL-запросов, время в базе,
+    время отрисовки шаблонов и попадания в кэш. Отдает их в заголовке
+    Server-Timing и в лог yatube.requests, проверяет QUERY_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics()
+        instrument_cache(caches["default"])
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        total = time.perf_counter() - start
+
+        view = view_path(request)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={metrics.sql_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f"tpl;dur={metrics.template_time * 1000:.1f}",
+            f'cache;desc="{metrics.cache_hits} hits, '
+            f'{metrics.cache_misses} misses"',
+            f"total;dur={total * 1000:.1f}",
+        ])
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "queries": metrics.queries,
+            "sql_ms": round(metrics.sql_time * 1000, 2),
+            "template_ms": round(metrics.template_time * 1000, 2),
+            "cache_hits": metrics.cache_hits,
+            "cache_misses": metrics.cache_misses,
+            "total_ms": round(total * 1000, 2),
+        }))
+        self.check_budget(view, metrics)
+        return response
+
+    def check_budget(self, view, metrics):
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = (f"{view} выполнил {metrics.queries} SQL-запросов "
+                   f"при бюджете {budget}")
+        if settings.QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
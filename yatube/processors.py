@@ -1,5 +1,7 @@
 import datetime as dt
 
+from .routers import reading_from_replica
+
 
 def year(request):
     """
@@ -9,3 +11,15 @@ def year(request):
     return {
         "year": current_year
     }
+
+
+def fragment_cache(request):
+    """
+    Время жизни кэша фрагментов лент для {% cache %}. Страница,
+    прочитанная с отстающей реплики, не кэшируется (0): иначе старые
+    данные остались бы в кэше под новой версией ленты до ее следующего
+    изменения.
+    """
+    return {
+        "fragment_timeout": 0 if reading_from_replica() else None
+    }
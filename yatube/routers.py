@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .instrumentation import func_path
+
+_local = threading.local()
+
+# Записи в эти приложения не требуют читать с основной базы:
+# сессии сохраняются на каждый запрос, миниатюры создаются в фоне.
+SERVICE_APPS = {"sessions", "thumbnail"}
+
+
+def replica_enabled():
+    return settings.REPLICA_DATABASE in settings.DATABASES
+
+
+def reading_from_replica():
+    return getattr(_local, "use_replica", False)
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтения ленточных страниц на реплику, если их включил
+    ReplicaMiddleware, все записи - на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in SERVICE_APPS:
+            _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы, объекты из них связаны.
+        return True
+
+
+class ReplicaMiddleware:
+    """
+    Включает чтение с реплики для GET-запросов к REPLICA_VIEWS. После
+    записи сессия на REPLICA_STICKINESS секунд закрепляется за основной
+    базой, чтобы пользователь сразу видел свой пост, комментарий или
+    подписку, даже если реплика отстает.
+    """
+
+    session_key = "_primary_until"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.use_replica = False
+        _local.wrote = False
+        try:
+            response = self.get_response(request)
+            if _local.wrote and replica_enabled():
+                request.session[self.session_key] = (
+                    time.time() + settings.REPLICA_STICKINESS
+                )
+            return response
+        finally:
+            _local.use_replica = False
+            _local.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = func_path(view_func)
+        _local.use_replica = (
+            replica_enabled()
+            and request.method in ("GET", "HEAD")
+            and view in settings.REPLICA_VIEWS
+            and request.session.get(self.session_key, 0) < time.time()
+        )
+
+
+def sync_replica(name=None):
+    """
+    Копирует основную базу SQLite в файл реплики (или в файл name)
+    через backup API, так при локальной разработке имитируется
+    репликация.
+    """
+    if name is None:
+        name = settings.DATABASES[settings.REPLICA_DATABASE]["NAME"]
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    target = sqlite3.connect(name)
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
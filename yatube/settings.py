@@ -31,11 +31,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "yatube.instrumentation.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "yatube.routers.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -49,12 +51,13 @@ ROOT_URLCONF = "yatube.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "yatube.instrumentation.TimedDjangoTemplates",
         "DIRS": ["templates"],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "yatube.processors.year",
+                "yatube.processors.fragment_cache",
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
@@ -69,11 +72,62 @@ WSGI_APPLICATION = "yatube.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "yatube.sqlite",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Соединение переиспользуется между запросами одного потока.
+        "CONN_MAX_AGE": 600,
+        # WAL не дает писателям блокировать читателей; synchronous=NORMAL
+        # в режиме WAL не теряет целостность, но реже вызывает fsync.
+        # Отрицательный cache_size задается в КиБ.
+        "PRAGMAS": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -64000,
+            "mmap_size": 268435456,
+            "temp_store": "MEMORY",
+        },
+        "TRANSACTION_MODE": "IMMEDIATE",
     }
 }
 
+# Реплика для чтения лент включается переменной окружения YATUBE_REPLICA
+# с путем к файлу. Локально ее заполняет команда sync_replica.
+REPLICA_DATABASE = "replica"
+
+if os.environ.get("YATUBE_REPLICA"):
+    DATABASES[REPLICA_DATABASE] = dict(
+        DATABASES["default"],
+        NAME=os.environ["YATUBE_REPLICA"],
+        TEST={"MIRROR": "default"},
+    )
+
+DATABASE_ROUTERS = ["yatube.routers.ReplicaRouter"]
+
+REPLICA_VIEWS = [
+    "posts.views.index",
+    "posts.views.group_posts",
+    "posts.views.profile",
+    "posts.views.post_view",
+    "posts.views.follow_index",
+    "posts.views.post_comments",
+    "posts.api.posts",
+    "posts.api.group_posts",
+    "posts.api.profile_posts",
+    "posts.api.follow_posts",
+    "posts.api.post_detail",
+    "posts.api.post_comments",
+    "posts.feeds.IndexFeed",
+    "posts.feeds.GroupFeed",
+    "posts.feeds.ProfileFeed",
+    "posts.feeds.AtomIndexFeed",
+    "posts.feeds.AtomGroupFeed",
+    "posts.feeds.AtomProfileFeed",
+]
+
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKINESS = 10
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -91,9 +145,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Кэш выбирается переменными окружения YATUBE_CACHE (locmem, file,
+# memcached, redis) и YATUBE_CACHE_LOCATION. locmem у каждого процесса
+# свой, поэтому при нескольких воркерах gunicorn нужен общий кэш; file
+# подходит как общий кэш на одной машине и для локальной проверки.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "memcached": "django.core.cache.backends.memcached.MemcachedCache",
+    "redis": "django_redis.cache.RedisCache",
+}
+
+CACHE_LOCATIONS = {
+    "locmem": "yatube",
+    "file": os.path.join(BASE_DIR, "cache"),
+    "memcached": "127.0.0.1:11211",
+    "redis": "redis://127.0.0.1:6379/1",
+}
+
+CACHE_BACKEND = os.environ.get("YATUBE_CACHE", "locmem")
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.environ.get("YATUBE_CACHE_LOCATION",
+                                   CACHE_LOCATIONS[CACHE_BACKEND]),
     }
 }
 
@@ -129,3 +205,79 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PER_PAGE = 10
+
+FEED_PAGINATION = "pages"
+
+COMMENTS_PER_PAGE = 20
+
+# Записей в лентах RSS и Atom (posts/feeds.py) и сколько секунд
+# хранится готовая лента одной версии.
+SYNDICATION_ITEMS = 20
+SYNDICATION_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Сколько лучших документов индекса (постов и комментариев) читает
+# поиск (posts/search.py). Результаты дальше не показываются.
+SEARCH_MAX_RESULTS = 1000
+
+# Наибольший limit в JSON API (posts/api.py).
+API_MAX_LIMIT = 1000
+
+# Через сколько секунд число постов в ленте считается заново.
+FEED_COUNT_TIMEOUT = 3600
+
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации, а подтягиваются при чтении ленты.
+FEED_FANOUT_LIMIT = 1000
+
+# Сколько последних постов автора добавляется в ленту при подписке
+# и при пересборке лент (posts.feed.rebuild). Более старые посты
+# в ленте подписок не показываются.
+FEED_BACKFILL_LIMIT = 500
+
+# Миниатюры для ленты создаются в фоновых потоках после загрузки картинки.
+# В тестах (yatube/test_settings.py) они создаются сразу.
+THUMBNAIL_ASYNC = True
+
+THUMBNAIL_WORKERS = 2
+
+# Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся кусками во временный
+# файл на диске, а не держатся в памяти. Картинки больше UPLOAD_MAX_BYTES
+# или UPLOAD_MAX_PIXELS форма отклоняет по заголовку, не декодируя.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+UPLOAD_MAX_BYTES = 10 * 2 ** 20
+
+UPLOAD_MAX_PIXELS = 40 * 10 ** 6
+
+# Сколько SQL-запросов может выполнить представление. При превышении
+# RequestMetricsMiddleware пишет предупреждение в лог yatube.requests,
+# а с QUERY_BUDGET_ENFORCE = True (в тестах) выбрасывает исключение.
+# Бюджет не больше PER_PAGE: лишний запрос на каждый пост страницы
+# его превысит.
+QUERY_BUDGETS = {
+    "posts.views.index": 10,
+    "posts.views.group_posts": 10,
+    "posts.views.profile": 10,
+    "posts.views.post_view": 10,
+    "posts.views.follow_index": 10,
+    "posts.views.search": 10,
+    "posts.views.post_comments": 10,
+}
+
+QUERY_BUDGET_ENFORCE = False
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "yatube.requests": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
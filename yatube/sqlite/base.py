@@ -0,0 +1,21 @@
+"""
+Бэкенд SQLite с настройкой соединения: при открытии выполняются
+PRAGMA из PRAGMAS в настройках базы, а транзакции с TRANSACTION_MODE
+"IMMEDIATE" сразу берут блокировку на запись.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get("PRAGMAS", {}).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # С обычным BEGIN транзакция, которая сначала читает, а потом
+        # пишет, получает "database is locked" без ожидания busy_timeout,
+        # если другой процесс успел записать между чтением и записью.
+        mode = self.settings_dict.get("TRANSACTION_MODE", "DEFERRED")
+        self.cursor().execute(f"BEGIN {mode}")
@@ -0,0 +1,14 @@
+"""
+Настройки для тестов: manage.py test и pytest подключают их вместо
+yatube.settings.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import LOGGING
+
+# База тестов живет в памяти, и фоновые потоки блокировали бы ее
+# таблицы, поэтому миниатюры создаются сразу.
+THUMBNAIL_ASYNC = False
+
+QUERY_BUDGET_ENFORCE = True
+
+LOGGING["loggers"]["yatube.requests"]["level"] = "WARNING"
@@ -12,6 +12,7 @@ urlpatterns = [
     path("auth/", include("django.contrib.auth.urls")),
     path("admin/", admin.site.urls),
     path("about/", include("about.urls", namespace="about")),
+    path("api/v1/", include("posts.api_urls", namespace="api_v1")),
     path("", include("posts.urls")),
 ]
 